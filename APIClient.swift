@@ -73,7 +73,46 @@ final class APIClient {
     // バックエンドに GET /clothes が必要です
     func fetchClothes() async throws -> [Cloth] {
         // バックエンド実装完了！
-        let path = "/clothes?user_id=\(currentUserId.uuidString)"
+        // GET /clothes はページングされているので、最後のページまで辿る
+        var all: [Cloth] = []
+        var cursor: String? = nil
+        repeat {
+            let page = try await fetchClothesPage(cursor: cursor)
+            all.append(contentsOf: page.clothes)
+            cursor = page.nextCursor
+        } while cursor != nil
+        return all
+    }
+
+    // 1ページ分を取得する。次ページのカーソルはレスポンスヘッダー X-Next-Cursor で返る
+    func fetchClothesPage(cursor: String? = nil, limit: Int = 100) async throws -> (clothes: [Cloth], nextCursor: String?) {
+        var comps = URLComponents(url: baseURL.appendingPathComponent("/clothes"), resolvingAgainstBaseURL: false)
+        var items = [
+            URLQueryItem(name: "user_id", value: currentUserId.uuidString),
+            URLQueryItem(name: "limit", value: String(limit))
+        ]
+        if let cursor = cursor {
+            items.append(URLQueryItem(name: "cursor", value: cursor))
+        }
+        comps?.queryItems = items
+        guard let url = comps?.url else {
+            throw APIError.invalidURL
+        }
+
+        var req = URLRequest(url: url)
+        req.setValue("application/json", forHTTPHeaderField: "Accept")
+        let (data, resp) = try await URLSession.shared.data(for: req)
+        let clothes: [Cloth] = try handleResponse(data: data, response: resp)
+        let next = (resp as? HTTPURLResponse)?.value(forHTTPHeaderField: "X-Next-Cursor")
+        return (clothes, next)
+    }
+
+    // 差分同期: 前回の nextToken 以降に追加・更新・削除された服だけを取得する
+    func fetchClothesChanges(since token: String?) async throws -> ClothChanges {
+        var path = "/clothes/changes?user_id=\(currentUserId.uuidString)"
+        if let token = token, !token.isEmpty {
+            path += "&since=\(token)"
+        }
         return try await request(path)
     }
 
@@ -125,11 +164,9 @@ final class APIClient {
     }
 
     func fetchWeather(latitude: Double, longitude: Double) async throws -> Weather {
-        // Mock API (FILE 2) doesn't use query params properly yet, usually internal logic
-        // But assuming we might want to visualize it or just rely on recommend api internally
-        // For now, let's keep request simple or remove if backend doesn't expose standalone weather
-        // Assuming backend *could* have GET /weather
-        return Weather(tempC: 20.0, weather: "Sunny") // Mock fallback
+        // GET /weather はサーバー側で位置(ジオハッシュ)単位にキャッシュされている
+        let path = "/weather?latitude=\(latitude)&longitude=\(longitude)"
+        return try await request(path)
     }
 
     func wear(clothIds: [UUID]) async throws {
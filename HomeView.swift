@@ -50,7 +50,7 @@ struct HomeView: View {
                         ScrollView(.horizontal, showsIndicators: false) {
                             HStack(spacing: 12) {
                                 ForEach(rec.clothes, id: \.id) { cloth in
-                                    AsyncImage(url: URL(string: cloth.imageURL)) { phase in
+                                    AsyncImage(url: URL(string: cloth.thumbnailURL)) { phase in
                                         switch phase {
                                         case .empty:
                                             Rectangle()
@@ -21,15 +21,37 @@ public struct Feature: Codable, Equatable {
 public struct Cloth: Codable, Identifiable, Equatable {
     public let id: UUID 
     public let imageURL: String 
+    // 派生画像の URL (sm: 一覧用, md: 詳細用)。古いサーバーや生成失敗時は nil / 空
+    public let thumbnails: [String: String]?
     public let category: String
     public let features: Feature?
     
     enum CodingKeys: String, CodingKey {
         case id = "cloth_id"
         case imageURL = "image_url"
+        case thumbnails
         case category
         case features
     }
+
+    // 一覧のグリッド用。サムネイルが無ければ原寸画像
+    public var thumbnailURL: String {
+        thumbnails?["sm"] ?? imageURL
+    }
+}
+
+// MARK: - ClothChanges (GET /clothes/changes の差分同期レスポンス)
+public struct ClothChanges: Codable, Equatable {
+    public let changed: [Cloth]
+    public let removed: [UUID]
+    public let nextToken: String
+    public let hasMore: Bool
+
+    enum CodingKeys: String, CodingKey {
+        case changed, removed
+        case nextToken = "next_token"
+        case hasMore = "has_more"
+    }
 }
 
 // MARK: - Recommendation
@@ -18,7 +18,7 @@ struct WardrobeView: View {
                         let columns = [GridItem(.adaptive(minimum: 120), spacing: 12)]
                         LazyVGrid(columns: columns, spacing: 12) {
                             ForEach(vm.clothes, id: \.id) { cloth in
-                                AsyncImage(url: URL(string: cloth.imageURL)) { phase in
+                                AsyncImage(url: URL(string: cloth.thumbnailURL)) { phase in
                                     switch phase {
                                     case .empty:
                                         Rectangle()
@@ -18,9 +18,14 @@ final class WardrobeViewModel: ObservableObject {
     func loadClothes() async {
         state = .loading
         do {
-            let list = try await api.fetchClothes()
-            self.clothes = list
+            // 1ページ目を先に表示し、残りのページは続けて追加する
+            var page = try await api.fetchClothesPage()
+            self.clothes = page.clothes
             state = .success
+            while let cursor = page.nextCursor {
+                page = try await api.fetchClothesPage(cursor: cursor)
+                self.clothes.append(contentsOf: page.clothes)
+            }
         } catch {
             state = .error(error.localizedDescription)
         }
@@ -0,0 +1,47 @@
+"""
+Benchmark suite entry point. Every command writes its results as JSON under benchmarks/results/
+(or --out) so runs can be compared with `compare`.
+
+    python -m benchmarks synthetic [--users N --wardrobe-sizes ...]   synthetic wardrobes in Postgres
+    python -m benchmarks micro [--sizes ...]                          scoring / mock vision micro-benchmarks
+    python -m benchmarks load [--scenarios ... --concurrency ...]     in-process ASGI load test
+    python -m benchmarks compare BEFORE.json AFTER.json               diff two result files
+
+    python -m benchmarks startup [--repeat N --workers N]             cold start and per-worker memory
+
+    python -m benchmarks scoring | prompt | governor | last_worn | similarity | daily_batch
+                                                                      the focused benchmarks
+
+`python -m benchmarks <command> --help` shows each command's options.
+"""
+from __future__ import annotations
+import importlib
+import sys
+
+COMMANDS = {
+    "synthetic": "benchmarks.synthetic",
+    "micro": "benchmarks.micro",
+    "load": "benchmarks.load",
+    "compare": "benchmarks.compare",
+    "startup": "benchmarks.bench_startup",
+    "scoring": "benchmarks.bench_scoring",
+    "prompt": "benchmarks.bench_prompt",
+    "governor": "benchmarks.bench_governor",
+    "last_worn": "benchmarks.bench_last_worn",
+    "similarity": "benchmarks.bench_similarity",
+    "daily_batch": "benchmarks.bench_daily_batch",
+}
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in COMMANDS:
+        print(__doc__.strip())
+        sys.exit(0 if len(sys.argv) < 2 or sys.argv[1] in ("-h", "--help") else 2)
+    command = sys.argv.pop(1)
+    # 各コマンドの argparse が "python -m benchmarks <command>" を prog として表示するように
+    sys.argv[0] = f"python -m benchmarks {command}"
+    importlib.import_module(COMMANDS[command]).main()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Daily batch scoring throughput (users/s): `services.daily_batch._score_chunk` in this process vs
+spread over the spawn process pool the batch uses. No database; wardrobes are synthetic.
+
+    python -m benchmarks.bench_daily_batch --users 2000 --wardrobe 60 --workers 1 2 4 8
+"""
+from __future__ import annotations
+import argparse
+import multiprocessing
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+from benchmarks.common import synthetic_candidates, write_results
+from services.candidate_cache import CandidateRow
+from services.daily_batch import Job, _score_chunk
+
+# 天気バケットごとにまとめて計算する想定で、数種類の天気を順に割り当てる
+WEATHERS = [("clear", 24.0), ("clear", 12.0), ("rain", 16.0), ("clear", 4.0)]
+
+
+def synthetic_jobs(users: int, wardrobe: int) -> List[Job]:
+    rows = tuple(
+        CandidateRow(uuid.UUID(c["cloth_id"]), c["category"], c["features"], c["image_url"], {})
+        for c in synthetic_candidates(wardrobe)
+    )
+    return [Job(uuid.uuid4(), rows, *WEATHERS[i % len(WEATHERS)]) for i in range(users)]
+
+
+def _run_pool(jobs: List[Job], workers: int, chunk: int) -> float:
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        # プロセス起動と import は計測から除く
+        list(pool.map(_score_chunk, [jobs[:1]] * workers))
+        t0 = time.perf_counter()
+        for _ in pool.map(_score_chunk, [jobs[i:i + chunk] for i in range(0, len(jobs), chunk)]):
+            pass
+        return time.perf_counter() - t0
+
+
+def run(users: int, wardrobe: int, workers: List[int], chunk: int) -> Dict[str, object]:
+    jobs = synthetic_jobs(users, wardrobe)
+    _score_chunk(jobs[:1])
+    t0 = time.perf_counter()
+    _score_chunk(jobs)
+    inline = time.perf_counter() - t0
+    print(f"in-process      {users / inline:10.1f} users/s  ({inline:.2f}s)")
+    results = [{"name": "in_process", "wall_s": inline, "throughput_rps": users / inline}]
+    for n in workers:
+        wall = _run_pool(jobs, n, chunk)
+        print(f"pool workers={n:<3}{users / wall:10.1f} users/s  ({wall:.2f}s, x{inline / wall:.1f})")
+        results.append({"name": f"pool_{n}", "workers": n, "wall_s": wall, "throughput_rps": users / wall})
+    return {"scoring": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--wardrobe", type=int, default=60, help="eligible clothes per user")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--chunk", type=int, default=100, help="users per pool task")
+    parser.add_argument("--out", help="JSON output path (default: benchmarks/results/)")
+    args = parser.parse_args()
+    results = run(args.users, args.wardrobe, args.workers, args.chunk)
+    print(f"wrote {write_results('daily_batch', {'params': vars(args), **results}, args.out)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Recommend latency through an upstream outage, with and without the OpenAI governor's breaker.
+Runs fully offline against `FakeAsyncOpenAI`, switching its fault injection per phase:
+
+  healthy -> errors (every call fails) -> hang (every call times out) -> recovery -> recovered
+
+"recovery" starts once the breaker may half-open (one probe goes upstream, the rest fall back);
+"recovered" is the next batch after the probe has closed it again.
+
+"ungoverned" keeps the same per-call deadline but never opens the breaker and has no
+concurrency/rate limits, which is how the old code behaved (every request waits for upstream).
+
+    python -m benchmarks.bench_governor --requests 200 --concurrency 20 --timeout 2
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import time
+from typing import Dict, List
+
+from benchmarks.common import percentiles, synthetic_candidates, write_results
+from benchmarks.fake_openai import FakeAsyncOpenAI
+from services import ai_stylist
+from services.governor import Governor
+
+PHASES = [
+    ("healthy", {"error_rate": 0.0, "hang_rate": 0.0}),
+    ("errors", {"error_rate": 1.0, "hang_rate": 0.0}),
+    ("hang", {"error_rate": 0.0, "hang_rate": 1.0}),
+    ("recovery", {"error_rate": 0.0, "hang_rate": 0.0}),
+    ("recovered", {"error_rate": 0.0, "hang_rate": 0.0}),
+]
+
+
+def _governor(mode: str, args) -> Governor:
+    if mode == "governed":
+        return Governor(
+            "openai",
+            max_concurrency=args.max_concurrency,
+            rate_per_sec=args.rate or None,
+            burst=args.burst,
+            timeout=args.timeout,
+            failure_threshold=args.failures,
+            reset_timeout=args.reset,
+        )
+    return Governor("openai", max_concurrency=1_000_000, timeout=args.timeout, queue_timeout=3600, failure_threshold=10**9)
+
+
+async def _phase(requests: int, concurrency: int, candidates, temp_c: float, weather: str) -> Dict[str, object]:
+    sem = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    paths = {"openai": 0, "heuristic": 0}
+
+    async def one():
+        async with sem:
+            t0 = time.perf_counter()
+            out = await ai_stylist.get_recommendation(candidates, temp_c, weather)
+            latencies.append(time.perf_counter() - t0)
+            # ローカルのヒューリスティックは alternatives 付きで返る
+            paths["heuristic" if "alternatives" in out else "openai"] += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return {"wall_s": time.perf_counter() - t0, **percentiles(latencies), **paths}
+
+
+async def run(args) -> Dict[str, object]:
+    candidates = synthetic_candidates(args.candidates)
+    fake = FakeAsyncOpenAI(latency_ms=args.latency_ms, ms_per_1k_tokens=0, hang_s=args.timeout * 30, seed=1)
+    ai_stylist.OPENAI_API_KEY = ai_stylist.OPENAI_API_KEY or "fake"
+    ai_stylist._openai_client = fake
+    ai_stylist.OPENAI_RECOMMEND_TIMEOUT = args.timeout
+
+    results: Dict[str, object] = {}
+    for mode in ("ungoverned", "governed"):
+        gov = ai_stylist.openai_governor = _governor(mode, args)
+        rows = []
+        for name, faults in PHASES:
+            if name == "recovery":
+                # ブレーカーが半開になるまで待ってから回復を確認する
+                await asyncio.sleep(args.reset)
+            fake.configure(**faults)
+            before = dict(gov.stats())
+            row = await _phase(args.requests, args.concurrency, candidates, 12.0, "clear")
+            after = gov.stats()
+            row["upstream_calls"] = after["calls"] - before["calls"]
+            row["rejected"] = sum(after[k] - before[k] for k in after if k.startswith("rejected_"))
+            row["breaker_state"] = after["state"]
+            rows.append({"phase": name, **row})
+            print(
+                f"{mode:<11} {name:<9} p50={row['p50_ms']:7.0f}ms p95={row['p95_ms']:7.0f}ms wall={row['wall_s']:6.2f}s"
+                f"  openai={row['openai']:>4} heuristic={row['heuristic']:>4}"
+                f"  upstream={row['upstream_calls']:>4} rejected={row['rejected']:>4} breaker={row['breaker_state']}"
+            )
+        results[mode] = rows
+    return {"params": vars(args), "modes": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--candidates", type=int, default=40)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--timeout", type=float, default=2.0, help="per-call deadline (s)")
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=0.0, help="governor rate limit per second (0 = none)")
+    parser.add_argument("--burst", type=float, default=10.0)
+    parser.add_argument("--failures", type=int, default=5, help="consecutive failures before the breaker opens")
+    parser.add_argument("--reset", type=float, default=2.0, help="seconds before the breaker half-opens")
+    parser.add_argument("--out", help="JSON output path (default: benchmarks/results/)")
+    args = parser.parse_args()
+    results = asyncio.run(run(args))
+    print(f"wrote {write_results('governor', results, args.out)}")
+
+
+if __name__ == "__main__":
+    main()
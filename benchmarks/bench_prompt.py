@@ -0,0 +1,74 @@
+"""
+Prompt size and latency of `recommend_with_openai`: compact encoding vs the old full-dict payload.
+Runs fully offline against `FakeAsyncOpenAI`.
+
+    python -m benchmarks.bench_prompt --sizes 20 100 500 2000
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.common import synthetic_candidates, write_results
+from benchmarks.fake_openai import FakeAsyncOpenAI
+from services import ai_stylist
+
+
+def _legacy_messages(candidates, temp_c, weather, tpo):
+    # 変更前の recommend_with_openai と同じペイロード (UUID と image_url を含む全候補)
+    user_msg = {"candidates": candidates, "temp_c": temp_c, "weather": weather, "tpo": tpo}
+    return [
+        {"role": "system", "content": "あなたはプロのスタイリストです。候補リストと天候・気温・TPOを考慮し、最適な組み合わせをJSONで返してください。"},
+        {"role": "user", "content": json.dumps(user_msg, ensure_ascii=False, default=str)},
+    ]
+
+
+async def run(sizes, latency_ms: float, ms_per_1k_tokens: float, temp_c: float = 12.0, weather: str = "clear"):
+    fake = FakeAsyncOpenAI(latency_ms=latency_ms, ms_per_1k_tokens=ms_per_1k_tokens)
+    ai_stylist.OPENAI_API_KEY = ai_stylist.OPENAI_API_KEY or "fake"
+    ai_stylist._openai_client = fake
+
+    results = []
+    for n in sizes:
+        cands = synthetic_candidates(n)
+
+        before = fake.prompt_tokens
+        t0 = time.perf_counter()
+        await fake.chat.completions.create(model="gpt-4o", messages=_legacy_messages(cands, temp_c, weather, None))
+        legacy_s = time.perf_counter() - t0
+        legacy_tokens = fake.prompt_tokens - before
+
+        before = fake.prompt_tokens
+        t0 = time.perf_counter()
+        out = await ai_stylist.recommend_with_openai(cands, temp_c, weather)
+        compact_s = time.perf_counter() - t0
+        compact_tokens = fake.prompt_tokens - before
+
+        row = {
+            "n": n,
+            "legacy": {"prompt_tokens": legacy_tokens, "latency_s": legacy_s},
+            "compact": {"prompt_tokens": compact_tokens, "latency_s": compact_s, "selected": len(out["selected"])},
+            "token_reduction": 1 - compact_tokens / legacy_tokens,
+        }
+        results.append(row)
+        print(
+            f"n={n:>5}  legacy={legacy_tokens:>7} tok {legacy_s * 1e3:7.0f}ms"
+            f"  compact={compact_tokens:>5} tok {compact_s * 1e3:6.0f}ms  (-{row['token_reduction']:.0%} tokens)"
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 100, 500, 2000])
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=100.0)
+    parser.add_argument("--out", help="JSON output path")
+    args = parser.parse_args()
+    results = asyncio.run(run(args.sizes, args.latency_ms, args.ms_per_1k_tokens))
+    print(f"wrote {write_results('prompt', results, args.out)}")
+
+
+if __name__ == "__main__":
+    main()
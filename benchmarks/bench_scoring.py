@@ -0,0 +1,48 @@
+"""
+Micro-benchmark: scalar `_recommend_outfit_scalar` vs NumPy `recommend_outfit_vectorized`.
+
+    python -m benchmarks.bench_scoring --sizes 10 100 1000 10000
+"""
+from __future__ import annotations
+import argparse
+
+from benchmarks.common import synthetic_candidates, time_call, write_results
+from services import scoring
+from services.ai_stylist import _recommend_outfit_scalar
+
+
+def run(sizes, temp_c: float = 10.0, weather: str = "rain"):
+    results = []
+    for n in sizes:
+        cands = synthetic_candidates(n)
+        row = {"n": n, "scalar": time_call(lambda: _recommend_outfit_scalar(cands, temp_c, weather, seed=1))}
+        if scoring.np is not None:
+            row["vectorized"] = time_call(lambda: scoring.recommend_outfit_vectorized(cands, temp_c, weather, seed=1))
+            # 配列化済みの行列に対するスコアリングのみ (バッチ処理で行列を使い回す場合)
+            m = scoring.CandidateMatrix(cands)
+            rng = scoring.np.random.default_rng(1)
+            row["vectorized_prebuilt"] = time_call(lambda: m.top_k(m.scores(temp_c, weather, rng), 1))
+            row["speedup"] = row["scalar"]["best_s"] / row["vectorized"]["best_s"]
+        results.append(row)
+        line = f"n={n:>6}  scalar={row['scalar']['best_s'] * 1e6:10.1f}us"
+        if "vectorized" in row:
+            line += (
+                f"  vectorized={row['vectorized']['best_s'] * 1e6:10.1f}us"
+                f"  prebuilt={row['vectorized_prebuilt']['best_s'] * 1e6:8.1f}us"
+                f"  x{row['speedup']:.1f}"
+            )
+        print(line)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--out", help="JSON output path")
+    args = parser.parse_args()
+    path = write_results("scoring", run(args.sizes), args.out)
+    print(f"wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Similarity index: GET /clothes/{id}/similar lookup time by wardrobe size, NumPy (vectorized
+popcount over the uint64 hashes) vs the per-item loop, plus the index build and the signature
+computation done at ingest.
+
+    python -m benchmarks.bench_similarity --sizes 100 1000 5000 20000
+"""
+from __future__ import annotations
+import argparse
+import random
+import tempfile
+import uuid
+from typing import Dict, List, NamedTuple
+
+from benchmarks.common import time_call, write_results
+from services import similarity
+
+
+class _Row(NamedTuple):
+    cloth_id: uuid.UUID
+    features: dict
+    phash: int
+    color_hist: bytes
+
+
+def synthetic_rows(n: int, seed: int = 1) -> List[_Row]:
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        # 1 割は直前の服の撮り直し (数ビットだけ違うハッシュ)
+        if rows and rng.random() < 0.1:
+            prev = rows[-1]
+            flip = sum(1 << rng.randrange(64) for _ in range(3))
+            h = similarity.to_signed64((prev.phash ^ flip) & ((1 << 64) - 1))
+            rows.append(_Row(uuid.uuid4(), prev.features, h, prev.color_hist))
+            continue
+        hist = bytes(rng.randrange(16) for _ in range(similarity.HIST_BYTES))
+        rows.append(_Row(uuid.uuid4(), {"color": "白"}, similarity.to_signed64(rng.getrandbits(64)), hist))
+    return rows
+
+
+def _signature_cost() -> Dict[str, float]:
+    from PIL import Image
+
+    img = Image.linear_gradient("L").resize((1600, 1200)).convert("RGB")
+    with tempfile.NamedTemporaryFile(suffix=".jpg") as f:
+        img.save(f, "JPEG", quality=85)
+        f.flush()
+        return time_call(lambda: similarity.signature_of(f.name), repeat=3)
+
+
+def run(sizes: List[int], k: int, max_distance: int) -> Dict[str, object]:
+    results = []
+    np_module = similarity.np
+    for n in sizes:
+        rows = synthetic_rows(n)
+        query = similarity.Signature(rows[-1].phash, rows[-1].color_hist)
+        row: Dict[str, object] = {"n": n, "build": time_call(lambda: similarity.UserIndex(rows), repeat=3)}
+        index = similarity.UserIndex(rows)
+        if np_module is not None:
+            row["search_numpy"] = time_call(lambda: index.search(query, k, max_distance, exclude=rows[-1].cloth_id))
+        similarity.np = None
+        try:
+            scalar = similarity.UserIndex(rows)
+            row["search_scalar"] = time_call(lambda: scalar.search(query, k, max_distance, exclude=rows[-1].cloth_id), repeat=3)
+        finally:
+            similarity.np = np_module
+        line = f"n={n:>6}  build={row['build']['best_s'] * 1e3:8.2f}ms  scalar={row['search_scalar']['best_s'] * 1e6:10.1f}us"
+        if "search_numpy" in row:
+            line += f"  numpy={row['search_numpy']['best_s'] * 1e6:8.1f}us  x{row['search_scalar']['best_s'] / row['search_numpy']['best_s']:.0f}"
+        print(line)
+        results.append(row)
+    out: Dict[str, object] = {"index": results}
+    if similarity.Image is not None:
+        out["signature_1600px_jpeg"] = sig = _signature_cost()
+        print(f"signature (1600px JPEG, in-process): {sig['best_s'] * 1e3:.2f}ms")
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000, 20000])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--max-distance", type=int, default=similarity.SIMILAR_MAX_DISTANCE)
+    parser.add_argument("--out", help="JSON output path (default: benchmarks/results/)")
+    args = parser.parse_args()
+    results = run(args.sizes, args.k, args.max_distance)
+    print(f"wrote {write_results('similarity', {'params': vars(args), **results}, args.out)}")
+
+
+if __name__ == "__main__":
+    main()
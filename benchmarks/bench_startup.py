@@ -0,0 +1,217 @@
+"""
+Startup cost of the API process and memory per worker.
+
+  * cold_start  fresh interpreter: `import main`, lifespan startup, first request (GET /weather),
+                RSS after each step. `lazy` is the default app; `eager` also loads the deferred
+                optional modules (NumPy, Pillow) right after the import, as before lazy init.
+  * workers     `--workers` processes serving after one request each, as gunicorn would run them:
+                `preload` imports the app once and forks (gunicorn.conf.py), `spawn` starts every
+                worker from scratch (uvicorn --workers). Reports RSS, PSS (shared pages split
+                between the processes that map them) and USS (pages private to the worker).
+
+Without a database the lifespan's DB steps fail fast and are included as such.
+
+    python -m benchmarks startup --repeat 5 --workers 4
+"""
+from __future__ import annotations
+import argparse
+import gc
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def memory_mb(pid: int | str = "self") -> Dict[str, Optional[float]]:
+    """RSS / PSS / USS of a process from /proc/<pid>/smaps_rollup (None where unavailable)."""
+    fields: Dict[str, int] = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if rest.strip().endswith("kB"):
+                    fields[key] = int(rest.split()[0])
+    except OSError:
+        pass
+    if not fields:
+        return {"rss_mb": None, "pss_mb": None, "uss_mb": None}
+    return {
+        "rss_mb": fields["Rss"] / 1024,
+        "pss_mb": fields["Pss"] / 1024,
+        "uss_mb": (fields["Private_Clean"] + fields["Private_Dirty"]) / 1024,
+    }
+
+
+async def _first_request(app, on_ready: Optional[Callable[[], None]] = None, hold: bool = False) -> Dict[str, float]:
+    import asyncio
+    import httpx
+
+    t0 = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        startup = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            await client.get("/weather", params={"latitude": 35.681, "longitude": 139.767})
+        first_request = time.perf_counter() - t0
+        if on_ready is not None:
+            on_ready()
+        while hold:
+            await asyncio.sleep(3600)
+    return {"startup_s": startup, "first_request_s": first_request}
+
+
+def _cold_start(eager: bool) -> None:
+    """Runs in a fresh interpreter; prints one JSON line."""
+    import asyncio
+
+    t0 = time.perf_counter()
+    import main
+
+    if eager:
+        from services import lazy
+
+        lazy.load_all()
+    out: Dict[str, object] = {"import_s": time.perf_counter() - t0, "import_rss_mb": memory_mb()["rss_mb"]}
+    out.update(asyncio.run(_first_request(main.app)))
+    out["rss_mb"] = memory_mb()["rss_mb"]
+    print(json.dumps(out))
+
+
+def _serve(ready_fd: int) -> None:
+    """Worker body: start the app, answer one request, signal `ready_fd`, then stay resident."""
+    import asyncio
+    import main
+
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+
+    def ready():
+        os.write(ready_fd, b"1")
+        os.close(ready_fd)
+
+    asyncio.run(_first_request(main.app, ready, hold=True))
+
+
+def _wait_ready(fd: int) -> None:
+    os.read(fd, 1)
+    os.close(fd)
+
+
+def _fleet(mode: str, workers: int) -> None:
+    """Runs in a helper interpreter: start `workers` workers, measure them, print one JSON line."""
+    pids: List[int] = []
+    if mode == "preload":
+        import main  # noqa: F401  (gunicorn の preload_app と同じく master で import してから fork する)
+        from services import lazy
+
+        lazy.load_all()
+        gc.freeze()
+        for _ in range(workers):
+            r, w = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                os.close(r)
+                try:
+                    _serve(w)
+                finally:
+                    os._exit(0)
+            os.close(w)
+            pids.append(pid)
+            _wait_ready(r)
+    else:
+        procs = []
+        for _ in range(workers):
+            r, w = os.pipe()
+            procs.append(subprocess.Popen(
+                [sys.executable, "-m", "benchmarks.bench_startup", "--serve", str(w)],
+                cwd=ROOT, pass_fds=(w,), stdout=subprocess.DEVNULL,
+            ))
+            os.close(w)
+            _wait_ready(r)
+        pids = [p.pid for p in procs]
+    try:
+        rows = [memory_mb(pid) for pid in pids]
+    finally:
+        for pid in pids:
+            os.kill(pid, signal.SIGKILL)
+        for pid in pids:
+            os.waitpid(pid, 0)
+    print(json.dumps(rows))
+
+
+def _run_child(args: List[str]) -> object:
+    out = subprocess.run([sys.executable, "-m", "benchmarks.bench_startup", *args], cwd=ROOT, capture_output=True, text=True, check=True)
+    # lifespan の DB エラーなども stdout に出るので、最後の行だけが結果
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def run(repeat: int, workers: int) -> Dict[str, List[Dict[str, object]]]:
+    cold = []
+    for name in ("lazy", "eager"):
+        samples = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            sample = _run_child(["--cold-start"] + (["--eager"] if name == "eager" else []))
+            sample["process_s"] = time.perf_counter() - t0
+            samples.append(sample)
+        row = {"name": name, **{k: statistics.median(s[k] for s in samples) for k in samples[0]}}
+        print(
+            f"cold start {name:<6} process={row['process_s']:.3f}s import={row['import_s']:.3f}s"
+            f" startup={row['startup_s']:.3f}s first_request={row['first_request_s'] * 1e3:.1f}ms"
+            f" rss={row['import_rss_mb']:.1f}MB after import, {row['rss_mb']:.1f}MB serving"
+        )
+        cold.append(row)
+
+    fleets = []
+    for mode in ("preload", "spawn"):
+        rows = _run_child(["--fleet", mode, "--workers", str(workers)])
+        row: Dict[str, object] = {"name": mode, "workers": workers}
+        for key in ("rss_mb", "pss_mb", "uss_mb"):
+            values = [r[key] for r in rows if r[key] is not None]
+            row[key] = statistics.mean(values) if values else None
+        row["total_pss_mb"] = sum(r["pss_mb"] for r in rows) if all(r["pss_mb"] is not None for r in rows) else None
+        if row["rss_mb"] is None:
+            print(f"workers {mode:<8} (no /proc/<pid>/smaps_rollup on this platform)")
+        else:
+            print(
+                f"workers {mode:<8} x{workers}: per worker rss={row['rss_mb']:.1f}MB pss={row['pss_mb']:.1f}MB"
+                f" uss={row['uss_mb']:.1f}MB, total pss={row['total_pss_mb']:.1f}MB"
+            )
+        fleets.append(row)
+    return {"cold_start": cold, "workers": fleets}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="cold starts per variant (median is reported)")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--out", help="JSON output path (default: benchmarks/results/)")
+    # 子プロセス用
+    parser.add_argument("--cold-start", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--eager", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--fleet", choices=("preload", "spawn"), help=argparse.SUPPRESS)
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.cold_start:
+        return _cold_start(args.eager)
+    if args.fleet:
+        return _fleet(args.fleet, args.workers)
+    if args.serve is not None:
+        return _serve(args.serve)
+    # 子プロセスの import 時間に含めないよう、ここで読み込む (common は services を import する)
+    from benchmarks.common import write_results
+
+    results = run(args.repeat, args.workers)
+    params = {"repeat": args.repeat, "workers": args.workers}
+    print(f"wrote {write_results('startup', {'params': params, **results}, args.out)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Compare two result files written by the benchmarks (same benchmark, e.g. before/after a change).
+Prints every latency / throughput figure present in both, with the relative change.
+
+    python -m benchmarks compare benchmarks/results/load-20250101-120000.json benchmarks/results/load-20250102-090000.json
+"""
+from __future__ import annotations
+import argparse
+import json
+from typing import Any, Dict, Iterator, Tuple
+
+# 比較する指標 (小さいほど良いものと、大きいほど良いもの)
+LOWER_IS_BETTER = (
+    "p50_ms", "p95_ms", "p99_ms", "best_s", "mean_s", "wall_s",
+    "process_s", "import_s", "startup_s", "first_request_s", "rss_mb", "pss_mb", "uss_mb", "total_pss_mb",
+)
+HIGHER_IS_BETTER = ("throughput_rps",)
+
+
+def _label(row: Dict[str, Any]) -> str:
+    # リストの要素は連番ではなく、識別用の値 (name, phase, concurrency, n) で突き合わせる
+    for k in ("name", "phase", "concurrency", "n"):
+        if k in row:
+            return f"{k}={row[k]}"
+    return ""
+
+
+def flatten(obj: Any, prefix: str = "") -> Iterator[Tuple[str, float]]:
+    """(path, value) for every compared metric in a results tree."""
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            if k == "params":
+                continue
+            if k in LOWER_IS_BETTER + HIGHER_IS_BETTER and isinstance(v, (int, float)):
+                yield f"{prefix}{k}", float(v)
+            else:
+                yield from flatten(v, f"{prefix}{k}.")
+    elif isinstance(obj, list):
+        for i, v in enumerate(obj):
+            label = _label(v) if isinstance(v, dict) else ""
+            yield from flatten(v, f"{prefix}[{label or i}].")
+
+
+def compare(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    a = dict(flatten(before.get("results", before)))
+    b = dict(flatten(after.get("results", after)))
+    out = {}
+    for path in a.keys() & b.keys():
+        change = (b[path] - a[path]) / a[path] if a[path] else 0.0
+        out[path] = {"before": a[path], "after": b[path], "change": change}
+    return dict(sorted(out.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=0.0, help="only show changes larger than this fraction")
+    args = parser.parse_args()
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    if before.get("benchmark") != after.get("benchmark"):
+        print(f"warning: comparing {before.get('benchmark')} with {after.get('benchmark')}")
+    rows = compare(before, after)
+    if not rows:
+        print("no common metrics")
+    for path, r in rows.items():
+        if abs(r["change"]) < args.threshold:
+            continue
+        metric = path.rsplit(".", 1)[-1]
+        better = (r["change"] < 0) == (metric in LOWER_IS_BETTER)
+        mark = "" if r["change"] == 0 else (" better" if better else " worse")
+        print(f"{path:<70} {r['before']:12.6g} -> {r['after']:12.6g}  {r['change'] * 100:+7.1f}%{mark}")
+
+
+if __name__ == "__main__":
+    main()
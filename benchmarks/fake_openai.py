@@ -0,0 +1,185 @@
+"""
+Local stand-in for the OpenAI chat completions API, for offline benchmarks.
+
+Two ways to use it:
+  * in-process: `FakeAsyncOpenAI()` mimics `AsyncOpenAI().chat.completions.create`
+  * over HTTP:  python -m benchmarks.fake_openai --port 8100
+                OPENAI_API_KEY=fake OPENAI_BASE_URL=http://127.0.0.1:8100/v1 uvicorn main:app
+
+Latency is simulated as `latency_ms + ms_per_1k_tokens * prompt_tokens / 1000` (plus up to
+`jitter_ms`), so prompt size shows up in response time the way it does upstream. Faults can be
+injected with `error_rate` (HTTP 500) and `hang_rate` (no answer for `hang_s`, i.e. a timeout),
+and changed at runtime to simulate an outage and its recovery:
+
+    curl -X POST localhost:8100/_fake/config -d '{"error_rate": 1.0}'
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import random
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from services.ai_stylist import _mock_analyze_image, estimate_tokens
+
+
+class FakeAPIError(Exception):
+    pass
+
+
+def _message_text(messages: List[Dict[str, Any]]) -> str:
+    parts = []
+    for m in messages:
+        content = m.get("content")
+        if isinstance(content, str):
+            parts.append(content)
+        elif isinstance(content, list):
+            parts.extend(c.get("text", "") for c in content if c.get("type") == "text")
+    return "\n".join(parts)
+
+
+def respond(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Plausible JSON answer for the prompts ai_stylist sends (vision or recommend)."""
+    last = messages[-1].get("content")
+    if isinstance(last, list):
+        url = next((c["image_url"]["url"] for c in last if c.get("type") == "image_url"), "")
+        return _mock_analyze_image(url)
+
+    payload = json.loads(last)
+    if "items" in payload:
+        # compact encoding: pick the first (best-ranked) row of each category
+        seen, selected = set(), []
+        for row in payload["items"]:
+            if row[1] not in seen:
+                seen.add(row[1])
+                selected.append(row[0])
+        return {"selected": selected, "reason": "fake: best-ranked item per category"}
+    # legacy encoding: full candidate dicts
+    seen, selected = set(), []
+    for c in payload.get("candidates", []):
+        if c.get("category") not in seen:
+            seen.add(c.get("category"))
+            selected.append({"cloth_id": c.get("cloth_id")})
+    return {"selected": selected, "reason": "fake: first item per category"}
+
+
+class FakeAsyncOpenAI:
+    """Drop-in for `AsyncOpenAI` exposing `chat.completions.create(...)`."""
+
+    CONFIG_FIELDS = ("latency_ms", "ms_per_1k_tokens", "jitter_ms", "error_rate", "hang_rate", "hang_s")
+
+    def __init__(
+        self,
+        latency_ms: float = 300.0,
+        ms_per_1k_tokens: float = 100.0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+        jitter_ms: float = 0.0,
+        hang_rate: float = 0.0,
+        hang_s: float = 120.0,
+    ):
+        self.latency_ms = latency_ms
+        self.ms_per_1k_tokens = ms_per_1k_tokens
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.hang_s = hang_s
+        self._rng = random.Random(seed)
+        self.calls = 0
+        self.errors = 0
+        self.hangs = 0
+        self.prompt_tokens = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def configure(self, **kwargs) -> Dict[str, float]:
+        for k, v in kwargs.items():
+            if k not in self.CONFIG_FIELDS:
+                raise ValueError(f"unknown fake config field: {k}")
+            setattr(self, k, float(v))
+        return self.config()
+
+    def config(self) -> Dict[str, float]:
+        return {k: getattr(self, k) for k in self.CONFIG_FIELDS}
+
+    def delay_s(self, prompt_tokens: int) -> float:
+        jitter = self._rng.random() * self.jitter_ms if self.jitter_ms else 0.0
+        return (self.latency_ms + jitter + self.ms_per_1k_tokens * prompt_tokens / 1000.0) / 1000.0
+
+    async def _create(self, model: str, messages: List[Dict[str, Any]], **kwargs):
+        tokens = estimate_tokens(_message_text(messages))
+        self.calls += 1
+        self.prompt_tokens += tokens
+        if self.hang_rate and self._rng.random() < self.hang_rate:
+            self.hangs += 1
+            await asyncio.sleep(self.hang_s)
+        await asyncio.sleep(self.delay_s(tokens))
+        if self.error_rate and self._rng.random() < self.error_rate:
+            self.errors += 1
+            raise FakeAPIError("injected upstream error")
+        content = json.dumps(respond(messages), ensure_ascii=False)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(prompt_tokens=tokens),
+        )
+
+
+def create_app(fake: FakeAsyncOpenAI) -> FastAPI:
+    app = FastAPI(title="fake-openai")
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        try:
+            resp = await fake._create(**body)
+        except FakeAPIError as e:
+            return JSONResponse({"error": {"message": str(e), "type": "server_error"}}, status_code=500)
+        return {
+            "id": f"chatcmpl-fake-{fake.calls}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model"),
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": resp.choices[0].message.content}}],
+            "usage": {"prompt_tokens": resp.usage.prompt_tokens, "completion_tokens": 0, "total_tokens": resp.usage.prompt_tokens},
+        }
+
+    @app.get("/_fake/config")
+    async def get_config():
+        return {**fake.config(), "calls": fake.calls, "errors": fake.errors, "hangs": fake.hangs}
+
+    @app.post("/_fake/config")
+    async def set_config(request: Request):
+        try:
+            return fake.configure(**(await request.json()))
+        except ValueError as e:
+            return JSONResponse({"detail": str(e)}, status_code=400)
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=100.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    parser.add_argument("--hang-s", type=float, default=120.0)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    fake = FakeAsyncOpenAI(
+        args.latency_ms, args.ms_per_1k_tokens, args.error_rate,
+        jitter_ms=args.jitter_ms, hang_rate=args.hang_rate, hang_s=args.hang_s,
+    )
+    uvicorn.run(create_app(fake), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
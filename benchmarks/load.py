@@ -0,0 +1,233 @@
+"""
+In-process load test of the API: requests go straight into the ASGI app (httpx.ASGITransport),
+so the numbers cover routing, validation, the DB round trips and the stylist without socket or
+server overhead. Each scenario runs at every `--concurrency` level; a level reports throughput
+and p50/p95/p99 latency.
+
+  * recommend       POST /recommend for a random synthetic user and city
+  * clothes         GET /clothes (first page)
+  * clothes_create  POST /clothes with a unique JPEG (store, thumbnails, mock vision, insert)
+  * wear            POST /wear with up to 3 of the user's clothes on a recent date
+
+Needs the synthetic users in DATABASE_URL (same --users/--seed as the generator). `wear` adds
+history rows and `clothes_create` adds clothes (deleted afterwards, images go to a temp dir);
+re-run `python -m benchmarks synthetic` to reset.
+
+    python -m benchmarks synthetic --users 1000
+    python -m benchmarks load --scenarios recommend clothes wear --concurrency 1 8 32 --requests 500
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import io
+import random
+import shutil
+import tempfile
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from benchmarks.common import CATEGORIES, asyncpg_dsn, percentiles, write_results
+from benchmarks.synthetic import user_ids
+
+# 天気キャッシュのバケットが分かれるよう、離れた都市を使う
+LOCATIONS = [(35.681, 139.767), (34.702, 135.495), (43.068, 141.351), (26.212, 127.679), (33.590, 130.421)]
+
+
+@dataclass
+class Fixture:
+    wardrobes: List[Tuple[uuid.UUID, List[uuid.UUID]]]
+    image: bytes = b""
+    created: List[str] = field(default_factory=list)
+    _uploads: int = 0
+
+    def __post_init__(self):
+        self.wearable = [w for w in self.wardrobes if w[1]]
+
+    def unique_image(self) -> bytes:
+        # JPEG の EOI 以降のバイトはデコーダに無視されるので、末尾に連番を付けて内容ハッシュだけ変える
+        self._uploads += 1
+        return self.image + self._uploads.to_bytes(8, "big")
+
+
+async def load_wardrobes(users: int, seed: int) -> List[Tuple[uuid.UUID, List[uuid.UUID]]]:
+    import asyncpg
+
+    conn = await asyncpg.connect(asyncpg_dsn())
+    try:
+        rows = await conn.fetch(
+            """
+            SELECT u.user_id, array_remove(array_agg(c.cloth_id), NULL) AS cloth_ids
+            FROM users u LEFT JOIN clothes c ON c.user_id = u.user_id AND c.status = 'ACTIVE'
+            WHERE u.user_id = ANY($1::uuid[])
+            GROUP BY u.user_id
+            """,
+            user_ids(users, seed),
+        )
+    finally:
+        await conn.close()
+    return [(r["user_id"], list(r["cloth_ids"])) for r in rows]
+
+
+async def delete_clothes(cloth_ids: List[str]) -> None:
+    import asyncpg
+
+    conn = await asyncpg.connect(asyncpg_dsn())
+    try:
+        await conn.execute("DELETE FROM clothes WHERE cloth_id = ANY($1::uuid[])", [uuid.UUID(c) for c in cloth_ids])
+    finally:
+        await conn.close()
+
+
+def make_jpeg(px: int) -> bytes:
+    from PIL import Image
+
+    img = Image.linear_gradient("L").resize((px, px * 3 // 4)).convert("RGB")
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=85)
+    return buf.getvalue()
+
+
+async def _recommend(client, rng: random.Random, fx: Fixture):
+    user, _ = rng.choice(fx.wardrobes)
+    lat, lon = rng.choice(LOCATIONS)
+    return await client.post("/recommend", json={"user_id": str(user), "latitude": lat, "longitude": lon})
+
+
+async def _clothes(client, rng: random.Random, fx: Fixture):
+    user, _ = rng.choice(fx.wardrobes)
+    return await client.get("/clothes", params={"user_id": str(user), "limit": 50})
+
+
+async def _clothes_create(client, rng: random.Random, fx: Fixture):
+    user, _ = rng.choice(fx.wardrobes)
+    resp = await client.post(
+        "/clothes",
+        data={"user_id": str(user), "category": rng.choice(CATEGORIES)},
+        files={"file": ("bench.jpg", fx.unique_image(), "image/jpeg")},
+    )
+    if resp.status_code == 200:
+        fx.created.append(resp.json()["cloth_id"])
+    return resp
+
+
+async def _wear(client, rng: random.Random, fx: Fixture):
+    user, cloth_ids = rng.choice(fx.wearable)
+    picked = rng.sample(cloth_ids, min(3, len(cloth_ids)))
+    worn = date.today() - timedelta(days=rng.randrange(30))
+    return await client.post("/wear", json={"user_id": str(user), "cloth_ids": [str(c) for c in picked], "worn_date": worn.isoformat()})
+
+
+Scenario = Callable[..., Awaitable[object]]
+SCENARIOS: Dict[str, Scenario] = {
+    "recommend": _recommend,
+    "clothes": _clothes,
+    "clothes_create": _clothes_create,
+    "wear": _wear,
+}
+
+
+async def run_level(client, scenario: Scenario, fx: Fixture, concurrency: int, requests: int, seed: int) -> Dict[str, object]:
+    """`concurrency` closed-loop clients sharing `requests` requests."""
+    from services.candidate_cache import candidate_cache
+
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    remaining = requests
+
+    async def client_loop(n: int):
+        nonlocal remaining
+        rng = random.Random(f"{seed}/{concurrency}/{n}")
+        while remaining > 0:
+            remaining -= 1
+            t0 = time.perf_counter()
+            try:
+                status = str((await scenario(client, rng, fx)).status_code)
+            except Exception as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - t0)
+            statuses[status] += 1
+
+    cache_before = candidate_cache.stats()
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client_loop(n) for n in range(concurrency)))
+    wall = time.perf_counter() - t0
+    cache_after = candidate_cache.stats()
+    return {
+        "concurrency": concurrency,
+        "wall_s": wall,
+        "throughput_rps": len(latencies) / wall,
+        **percentiles(latencies),
+        "errors": sum(n for s, n in statuses.items() if not s.startswith("2")),
+        "status": dict(statuses),
+        "candidate_cache": {k: cache_after[k] - cache_before[k] for k in ("hits", "misses")},
+    }
+
+
+async def run(args) -> Dict[str, object]:
+    import httpx
+    import main as api
+
+    fx = Fixture(await load_wardrobes(args.users, args.seed))
+    if not fx.wardrobes:
+        raise SystemExit("no synthetic users found; run `python -m benchmarks synthetic` first (same --users/--seed)")
+    scenarios = list(args.scenarios)
+    if "clothes_create" in scenarios:
+        from services.thumbnails import Image
+
+        if Image is None:
+            print("Pillow is not installed; skipping clothes_create")
+            scenarios.remove("clothes_create")
+        else:
+            fx.image = make_jpeg(args.image_px)
+    print(f"{len(fx.wardrobes)} users, {sum(len(c) for _, c in fx.wardrobes)} active clothes")
+
+    # アップロードはリポジトリの uploads/ を汚さないよう一時ディレクトリへ (/uploads の配信先も同じにするため、差し替えてからアプリを作る)
+    upload_dir = Path(tempfile.mkdtemp(prefix="bench-uploads-"))
+    api.UPLOAD_DIR = upload_dir
+    app = api.create_app()
+    results: Dict[str, List[Dict[str, object]]] = {}
+    try:
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+                for name in scenarios:
+                    scenario = SCENARIOS[name]
+                    await run_level(client, scenario, fx, min(args.concurrency), args.warmup, args.seed + 1)
+                    rows = results[name] = []
+                    for c in args.concurrency:
+                        row = await run_level(client, scenario, fx, c, args.requests, args.seed)
+                        rows.append(row)
+                        print(
+                            f"{name:<15} c={c:<4} {row['throughput_rps']:8.1f} req/s"
+                            f"  p50={row['p50_ms']:8.2f}ms p95={row['p95_ms']:8.2f}ms p99={row['p99_ms']:8.2f}ms"
+                            f"  errors={row['errors']}"
+                        )
+    finally:
+        if fx.created:
+            await delete_clothes(fx.created)
+        shutil.rmtree(upload_dir, ignore_errors=True)
+    return {"params": vars(args), "scenarios": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario and concurrency level")
+    parser.add_argument("--warmup", type=int, default=50, help="untimed requests before each scenario")
+    parser.add_argument("--users", type=int, default=1000, help="as passed to the synthetic generator")
+    parser.add_argument("--seed", type=int, default=1, help="as passed to the synthetic generator")
+    parser.add_argument("--image-px", type=int, default=1600, help="long edge of the clothes_create upload")
+    parser.add_argument("--out", help="JSON output path (default: benchmarks/results/)")
+    args = parser.parse_args()
+    results = asyncio.run(run(args))
+    print(f"wrote {write_results('load', results, args.out)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Micro-benchmarks of the pure-Python hot paths behind /recommend and POST /clothes:
+
+  * heuristic_score   `_heuristic_score` on one candidate
+  * recommend_outfit  `recommend_outfit` (outfit beam search) at each wardrobe size; only its
+                      `prune_candidates` step uses the vectorized scorer, at VECTORIZE_MIN_CANDIDATES and above
+  * mock_analyze      `_mock_analyze_image` (the vision path without an API key)
+
+    python -m benchmarks micro --sizes 10 100 1000
+"""
+from __future__ import annotations
+import argparse
+import itertools
+import random
+from typing import Dict, List
+
+from benchmarks.common import synthetic_candidates, time_call, write_results
+from services.ai_stylist import _heuristic_score, _mock_analyze_image, recommend_outfit
+
+WEATHERS = ("clear", "rain")
+
+
+def _row(name: str, r: Dict[str, float], **extra) -> Dict[str, object]:
+    print(f"  {name:<32} {r['best_s'] * 1e6:12.2f}us  (mean {r['mean_s'] * 1e6:.2f}us, {r['loops']} loops)")
+    return {"name": name, **extra, **r}
+
+
+def run(sizes: List[int], temp_c: float = 12.0) -> Dict[str, List[Dict[str, object]]]:
+    results: Dict[str, List[Dict[str, object]]] = {"heuristic_score": [], "recommend_outfit": [], "mock_analyze": []}
+
+    print("heuristic_score:")
+    item = synthetic_candidates(1)[0]
+    rng = random.Random(1)
+    for weather in WEATHERS:
+        r = time_call(lambda: _heuristic_score(item, temp_c, weather, None, rng))
+        results["heuristic_score"].append(_row(f"weather={weather}", r, weather=weather))
+
+    print("recommend_outfit:")
+    for n in sizes:
+        cands = synthetic_candidates(n)
+        for weather in WEATHERS:
+            r = time_call(lambda: recommend_outfit(cands, temp_c, weather, seed=1))
+            results["recommend_outfit"].append(_row(f"n={n} weather={weather}", r, n=n, weather=weather))
+
+    print("mock_analyze_image:")
+    paths = [f"http://localhost:8000/uploads/{i:064x}.jpg" for i in range(1000)]
+    counter = itertools.count()
+    r = time_call(lambda: _mock_analyze_image(paths[next(counter) % len(paths)]))
+    results["mock_analyze"].append(_row("per image", r))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--temp", type=float, default=12.0)
+    parser.add_argument("--out", help="JSON output path (default: benchmarks/results/)")
+    args = parser.parse_args()
+    results = run(args.sizes, args.temp)
+    print(f"wrote {write_results('micro', {'params': vars(args), **results}, args.out)}")
+
+
+if __name__ == "__main__":
+    main()
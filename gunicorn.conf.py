@@ -0,0 +1,46 @@
+"""
+Preforking deployment with uvicorn workers:
+
+    gunicorn -c gunicorn.conf.py main:app
+
+The master imports the app once (preload_app) and forks the workers, so the code and the
+FastAPI / SQLAlchemy / pydantic structures built at import are shared copy-on-write instead of
+loaded by every worker. Importing main has no per-process side effects: each worker creates its
+DB engine and pool, upload directory and analysis workers in the lifespan after the fork, and the
+OpenAI client on first use.
+"""
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.environ.get("WORKER_TIMEOUT", "60"))
+graceful_timeout = int(os.environ.get("WORKER_GRACEFUL_TIMEOUT", "30"))
+
+# NumPy / Pillow は通常は初回使用時に読み込むが、preload では master で読み込んで全ワーカーで共有する
+PRELOAD_OPTIONAL_DEPS = os.environ.get("PRELOAD_OPTIONAL_DEPS", "1").lower() not in ("0", "false", "no")
+
+# master での import 中は GC を止め、fork の直前に gc.freeze() で既存オブジェクトを永続世代へ移す。
+# ワーカーの GC が共有ページ上のオブジェクトのヘッダに書き込まなくなり、コピーオンライトで複製されない
+gc.disable()
+
+
+def when_ready(server):
+    if PRELOAD_OPTIONAL_DEPS:
+        from services import lazy
+
+        server.log.info("preloaded optional modules: %s", ", ".join(lazy.load_all()) or "none")
+    gc.freeze()
+    gc.enable()
+
+
+def pre_fork(server, worker):
+    # ワーカーの再起動時は、master でその後に作られたオブジェクトもまとめて凍結する
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    gc.enable()
@@ -50,11 +50,15 @@ CREATE TABLE IF NOT EXISTS users (
   -- 必要に応じてカラムを追加してください
   created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
   -- 行の最終更新時刻。アプリ/DB トリガーで更新する想定
-  updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  -- 最後に POST /recommend を使った日と位置 (天気キャッシュと同じ精度の geohash)
+  last_active_date DATE DEFAULT NULL,
+  last_geohash TEXT DEFAULT NULL
 );
 
 COMMENT ON TABLE users IS 'ユーザー情報。wash_cycle_days により提案から除外する着用期間を制御する。';
 COMMENT ON COLUMN users.wash_cycle_days IS '洗濯頻度（日）。この日数以内に着た服は提案しない。デフォルト3。';
+COMMENT ON COLUMN users.last_geohash IS '最後の POST /recommend の位置（geohash）。日次の事前計算はこのセルの天気で行う。';
 
 -- clothes テーブル
 CREATE TABLE IF NOT EXISTS clothes (
@@ -63,12 +67,20 @@ CREATE TABLE IF NOT EXISTS clothes (
   image_url TEXT NOT NULL,
   category TEXT NOT NULL,
   features JSONB NOT NULL,
+  -- 派生画像 (サムネイル) の URL。{"sm": "...", "md": "..."}。生成できなかった場合は空
+  thumbnails JSONB NOT NULL DEFAULT '{}'::jsonb,
   status outfit_status NOT NULL DEFAULT 'ACTIVE',
   created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
   -- 論理削除時刻（status = 'DISCARDED' のときにセットする）
   deleted_at TIMESTAMPTZ DEFAULT NULL,
   -- 行の最終更新時刻
   updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  -- 最後に着用した日と着用回数（worn_history の非正規化。POST /wear が同じトランザクションで更新する）
+  last_worn_date DATE DEFAULT NULL,
+  wear_count INTEGER NOT NULL DEFAULT 0,
+  -- 画像の知覚ハッシュ（dHash 64 ビット）と色ヒストグラム（RGB 各 4 段階 = 64 バイト）。近似重複の検出用
+  phash BIGINT DEFAULT NULL,
+  color_hist BYTEA DEFAULT NULL,
   CONSTRAINT fk_clothes_user FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
 );
 
@@ -88,24 +100,62 @@ JSONB で保存する AI 用特徴データの想定構造:
 -- アプリ/バックエンド側でこの構造を尊重して検索・判定を行う。
 $$;
 COMMENT ON COLUMN clothes.status IS '服の状態。ACTIVE(利用可能) / LAUNDRY(洗濯中) / DISCARDED(廃棄)';
+COMMENT ON COLUMN clothes.thumbnails IS '内容ハッシュ名の派生画像 URL（sm: 一覧用 256px, md: 詳細・Vision 用 512px）。';
+COMMENT ON COLUMN clothes.last_worn_date IS '最後に着用した日。NULL は未着用。提案除外判定はこの列だけで行う。';
+COMMENT ON COLUMN clothes.wear_count IS '着用回数（worn_history の行数と一致）。';
+COMMENT ON COLUMN clothes.phash IS 'アップロード画像の dHash（64 ビットを符号付きで格納）。NULL は未計算（取り込み・移行前の画像）。';
+COMMENT ON COLUMN clothes.color_hist IS '色ヒストグラム（64 ビン × 1 バイト）。phash と組み合わせて同じ服の撮り直しを判定する。';
 
 -- worn_history テーブル
+-- worn_date による月単位のレンジパーティション。パーティションキーを含める必要があるため
+-- 主キーは (history_id, worn_date) になる。
 CREATE TABLE IF NOT EXISTS worn_history (
-  history_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  history_id UUID NOT NULL DEFAULT gen_random_uuid(),
   cloth_id UUID NOT NULL,
   worn_date DATE NOT NULL,
   CONSTRAINT fk_history_cloth FOREIGN KEY (cloth_id) REFERENCES clothes(cloth_id) ON DELETE CASCADE,
   -- 最終更新時刻
-  updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
-);
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (history_id, worn_date)
+) PARTITION BY RANGE (worn_date);
+
+-- 月パーティションを from_month から months ヶ月分作成する（既存はスキップ）
+-- 毎月のバッチ（または cron）で先の月を作成しておくこと。API プロセスも起動時と 1 日ごとに数ヶ月先まで作成する。
+CREATE OR REPLACE FUNCTION ensure_worn_history_partitions(from_month DATE, months INTEGER) RETURNS void AS $$
+DECLARE
+  m DATE;
+BEGIN
+  FOR i IN 0..months - 1 LOOP
+    m := (date_trunc('month', from_month) + make_interval(months => i))::date;
+    EXECUTE format(
+      'CREATE TABLE IF NOT EXISTS %I PARTITION OF worn_history FOR VALUES FROM (%L) TO (%L)',
+      'worn_history_' || to_char(m, 'YYYYMM'), m, (m + interval '1 month')::date
+    );
+  END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 過去 12 ヶ月 + 先 3 ヶ月。範囲外（過去データの取り込みなど）は default パーティションに入る。
+-- 注意: default に行がある月のパーティションは後から作成できないため、先の月は早めに作成しておく。
+SELECT ensure_worn_history_partitions((current_date - interval '12 months')::date, 16);
+CREATE TABLE IF NOT EXISTS worn_history_default PARTITION OF worn_history DEFAULT;
 
 COMMENT ON TABLE worn_history IS '服の着用履歴。wash_cycle に基づく提案除外判定の根拠となる。';
 COMMENT ON COLUMN worn_history.worn_date IS '着用日（DATE）。この日付から wash_cycle_days を計算して提案除外する。';
 
 -- インデックス: 検索でよく使う列に対して
 CREATE INDEX IF NOT EXISTS idx_clothes_user_id ON clothes(user_id);
+-- GET /clothes のキーセットページング用 (ORDER BY created_at DESC, cloth_id DESC と一致させる)
+CREATE INDEX IF NOT EXISTS idx_clothes_user_active_created ON clothes(user_id, created_at DESC, cloth_id DESC) WHERE status = 'ACTIVE';
+-- 差分同期 (GET /clothes/changes) と ETag 計算 (件数・max(updated_at)) 用
+CREATE INDEX IF NOT EXISTS idx_clothes_user_updated ON clothes(user_id, updated_at, cloth_id);
+-- POST /recommend の候補取得 (last_worn_date IS NULL OR last_worn_date < cutoff) 用
+CREATE INDEX IF NOT EXISTS idx_clothes_user_last_worn ON clothes(user_id, last_worn_date) WHERE status = 'ACTIVE';
 CREATE INDEX IF NOT EXISTS idx_worn_history_cloth_id ON worn_history(cloth_id);
 CREATE INDEX IF NOT EXISTS idx_worn_history_worn_date ON worn_history(worn_date);
+-- 同じ服を同じ日に二重記録しない (POST /wear は ON CONFLICT DO NOTHING で冪等になる)
+-- パーティションキー worn_date を含むので、パーティション親テーブルにも作成できる
+CREATE UNIQUE INDEX IF NOT EXISTS uq_worn_history_cloth_date ON worn_history(cloth_id, worn_date);
 
 -- JSONB 検索向けインデックス: features の GIN インデックスは部分一致や包含検索を高速化します
 CREATE INDEX IF NOT EXISTS idx_clothes_features_gin ON clothes USING GIN (features);
@@ -130,6 +180,70 @@ COMMENT ON TABLE user_auth_providers IS '外部認証プロバイダ（Firebase,
 COMMENT ON COLUMN user_auth_providers.provider IS '例: "firebase", "apple"';
 COMMENT ON COLUMN user_auth_providers.provider_user_id IS '外部プロバイダが返す一意のユーザーID（UID）。プロバイダごとにユニーク。';
 
+-- 画像解析ジョブキュー
+-- POST /clothes を defer_analysis=true で呼んだ場合、服は features = '{}' で即時登録され、
+-- バックエンドのワーカーがこのテーブルからジョブを取り出して features を埋める。
+-- ジョブは DB に永続化されるため、プロセス再起動後もリース切れ(locked_until)から再開される。
+CREATE TABLE IF NOT EXISTS analysis_jobs (
+  job_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  cloth_id UUID NOT NULL UNIQUE REFERENCES clothes(cloth_id) ON DELETE CASCADE,
+  image_url TEXT NOT NULL,
+  status TEXT NOT NULL DEFAULT 'PENDING' CHECK (status IN ('PENDING', 'RUNNING', 'DONE', 'FAILED')),
+  attempts INTEGER NOT NULL DEFAULT 0,
+  -- 次に実行可能になる時刻（リトライ時はバックオフ分だけ未来に設定）
+  run_after TIMESTAMPTZ NOT NULL DEFAULT now(),
+  -- RUNNING ジョブのリース期限。これを過ぎたジョブは別ワーカーが再取得できる
+  locked_until TIMESTAMPTZ DEFAULT NULL,
+  last_error TEXT,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+COMMENT ON TABLE analysis_jobs IS '非同期の画像解析ジョブ。ワーカーが FOR UPDATE SKIP LOCKED で取り出す。';
+
+-- 未完了ジョブだけを対象にした部分インデックス（キューの取り出し用）
+CREATE INDEX IF NOT EXISTS idx_analysis_jobs_runnable ON analysis_jobs(run_after) WHERE status IN ('PENDING', 'RUNNING');
+
+-- 画像特徴キャッシュ
+-- 画像内容の SHA-256 とモデル名・プロンプトのバージョンをキーに、Vision API の解析結果を保存する。
+-- プロンプトを変更するとバージョンが変わるため、古いエントリは参照されなくなり purge で削除される。
+CREATE TABLE IF NOT EXISTS feature_cache (
+  content_hash TEXT NOT NULL,
+  model TEXT NOT NULL,
+  prompt_version TEXT NOT NULL,
+  features JSONB NOT NULL,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (content_hash, model, prompt_version)
+);
+
+COMMENT ON TABLE feature_cache IS 'Vision API の解析結果キャッシュ。TTL 切れとプロンプト変更で無効化される。';
+
+-- TTL による削除用
+CREATE INDEX IF NOT EXISTS idx_feature_cache_created_at ON feature_cache(created_at);
+
+-- 日次の事前計算済みコーデ
+-- services/daily_batch.py がピーク前に、最近使われたユーザーの当日分を計算して保存する。
+-- POST /recommend は日付・geohash・洗濯間隔・服の版 (件数と max(updated_at)) が一致し、
+-- 天気帯 (雨かどうか・目標の暖かさ) が変わっていない場合だけ response をそのまま返す。
+CREATE TABLE IF NOT EXISTS daily_recommendations (
+  user_id UUID NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+  rec_date DATE NOT NULL,
+  geohash TEXT NOT NULL,
+  weather TEXT NOT NULL,
+  temp_c DOUBLE PRECISION NOT NULL,
+  wash_cycle_days INTEGER NOT NULL,
+  clothes_count INTEGER NOT NULL,
+  clothes_updated_at TIMESTAMPTZ DEFAULT NULL,
+  response JSONB NOT NULL,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (user_id, rec_date)
+);
+
+COMMENT ON TABLE daily_recommendations IS '日次バッチで事前計算した RecommendResponse。入力が変わった場合は使われず、翌日のバッチで削除される。';
+
+-- 日次バッチの対象ユーザー (最近 /recommend を使い、位置が分かっているユーザー) の抽出用
+CREATE INDEX IF NOT EXISTS idx_users_last_active ON users(last_active_date) WHERE last_geohash IS NOT NULL;
+
 -- トリガー: updated_at を自動更新する汎用関数とトリガー
 CREATE OR REPLACE FUNCTION set_updated_at() RETURNS trigger AS $$
 BEGIN
@@ -142,6 +256,23 @@ CREATE TRIGGER trg_users_set_updated_at BEFORE UPDATE ON users FOR EACH ROW EXEC
 CREATE TRIGGER trg_clothes_set_updated_at BEFORE UPDATE ON clothes FOR EACH ROW EXECUTE FUNCTION set_updated_at();
 CREATE TRIGGER trg_worn_history_set_updated_at BEFORE UPDATE ON worn_history FOR EACH ROW EXECUTE FUNCTION set_updated_at();
 CREATE TRIGGER trg_user_auth_providers_set_updated_at BEFORE UPDATE ON user_auth_providers FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+CREATE TRIGGER trg_analysis_jobs_set_updated_at BEFORE UPDATE ON analysis_jobs FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+-- トリガー: 服の追加・更新・削除を wardrobe_changed チャンネルに user_id で通知する。
+-- 各 API プロセスが LISTEN して、そのユーザーの候補・類似検索キャッシュを捨てる (services/wardrobe_events.py)。
+-- 通知はコミット時に送られ、同じトランザクション内の同じ user_id はまとめられる
+CREATE OR REPLACE FUNCTION notify_wardrobe_changed() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'DELETE' THEN
+    PERFORM pg_notify('wardrobe_changed', OLD.user_id::text);
+  ELSE
+    PERFORM pg_notify('wardrobe_changed', NEW.user_id::text);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_clothes_notify_wardrobe_changed AFTER INSERT OR UPDATE OR DELETE ON clothes FOR EACH ROW EXECUTE FUNCTION notify_wardrobe_changed();
 
 -- 利便性: 各テーブルの最終更新などを取得する簡易ビュー（任意）
 -- CREATE OR REPLACE VIEW vw_user_clothes_count AS
@@ -151,20 +282,19 @@ CREATE TRIGGER trg_user_auth_providers_set_updated_at BEFORE UPDATE ON user_auth
 
 -- 使用例（コメント）:
 -- 1) あるユーザーの、wash_cycle_days 期間内に着られた服を除外して候補を取得するクエリ例
+--    worn_history は見ずに、非正規化した clothes.last_worn_date だけで判定する
 --    SELECT c.*
 --    FROM clothes c
 --    JOIN users u ON c.user_id = u.user_id
 --    WHERE c.user_id = '<ユーザーUUID>'
 --      AND c.status = 'ACTIVE'
---      AND NOT EXISTS (
---        SELECT 1 FROM worn_history w
---        WHERE w.cloth_id = c.cloth_id
---          AND w.worn_date >= (current_date - u.wash_cycle_days)
---      );
+--      AND (c.last_worn_date IS NULL OR c.last_worn_date < current_date - u.wash_cycle_days);
 
 -- 注意事項:
 -- - features の JSONB についてはバックエンド側でスキーマバリデーション（例: pydantic）を行ってください。
 -- - 必要に応じて clothes.category を ENUM にしても良いですが、将来的な拡張性を考慮して TEXT にしています。
--- - 大量データが発生する場合、worn_history をパーティショニング（日付ベース）することを検討してください。
+-- - worn_history は月単位でパーティショニングしています。古い月は DETACH / DROP で安価に削除できますが、
+--   clothes.wear_count は累計値なので、削除しても減らさない運用とします。
+-- - 既存 DB の移行（列追加・バックフィル・パーティション化）は migrations/001_last_worn_and_partitioned_history.sql を参照。
 
 -- EOF
@@ -0,0 +1,112 @@
+-- SmartOutfit: 既存 DB の移行
+-- ファイル: migrations/001_last_worn_and_partitioned_history.sql
+-- 用途:
+--   1) clothes に last_worn_date / wear_count を追加し、worn_history からバックフィルする
+--   2) worn_history を worn_date の月単位レンジパーティションに作り替える
+-- 新規 DB は init_db.sql に反映済みなので、この移行は不要です。
+--
+-- 実行例: psql "$DATABASE_URL" -v ON_ERROR_STOP=1 -f migrations/001_last_worn_and_partitioned_history.sql
+--
+-- 注意:
+-- - 1 トランザクションで実行します。worn_history のコピー中は書き込みがブロックされるため、
+--   POST /wear を止められる時間帯に実行してください（1,000 万行で数分程度）。
+-- - 移行前のテーブルは worn_history_legacy として残します。確認後に DROP してください。
+
+BEGIN;
+
+-- 1) 非正規化列の追加 -------------------------------------------------------
+ALTER TABLE clothes ADD COLUMN IF NOT EXISTS last_worn_date DATE DEFAULT NULL;
+ALTER TABLE clothes ADD COLUMN IF NOT EXISTS wear_count INTEGER NOT NULL DEFAULT 0;
+
+COMMENT ON COLUMN clothes.last_worn_date IS '最後に着用した日。NULL は未着用。提案除外判定はこの列だけで行う。';
+COMMENT ON COLUMN clothes.wear_count IS '着用回数（worn_history の行数と一致）。';
+
+-- バックフィルで updated_at が一斉に更新されると、差分同期 (GET /clothes/changes) で
+-- 全件が再送されてしまうため、この間だけトリガーを止める
+ALTER TABLE clothes DISABLE TRIGGER trg_clothes_set_updated_at;
+
+-- (cloth_id, worn_date) の重複は移行後のユニーク制約に合わせて 1 件として数える
+UPDATE clothes c
+SET last_worn_date = w.last_worn_date,
+    wear_count = w.wear_count
+FROM (
+  SELECT cloth_id, max(worn_date) AS last_worn_date, count(DISTINCT worn_date) AS wear_count
+  FROM worn_history
+  GROUP BY cloth_id
+) w
+WHERE c.cloth_id = w.cloth_id;
+
+ALTER TABLE clothes ENABLE TRIGGER trg_clothes_set_updated_at;
+
+CREATE INDEX IF NOT EXISTS idx_clothes_user_last_worn ON clothes(user_id, last_worn_date) WHERE status = 'ACTIVE';
+
+-- 2) worn_history のパーティション化 ----------------------------------------
+-- 既存テーブルと付随オブジェクトをリネームして退避
+ALTER TABLE worn_history RENAME TO worn_history_legacy;
+ALTER TABLE worn_history_legacy RENAME CONSTRAINT worn_history_pkey TO worn_history_legacy_pkey;
+ALTER TABLE worn_history_legacy RENAME CONSTRAINT fk_history_cloth TO fk_history_legacy_cloth;
+DROP TRIGGER IF EXISTS trg_worn_history_set_updated_at ON worn_history_legacy;
+DROP INDEX IF EXISTS idx_worn_history_cloth_id;
+DROP INDEX IF EXISTS idx_worn_history_worn_date;
+DROP INDEX IF EXISTS uq_worn_history_cloth_date;
+
+CREATE TABLE worn_history (
+  history_id UUID NOT NULL DEFAULT gen_random_uuid(),
+  cloth_id UUID NOT NULL,
+  worn_date DATE NOT NULL,
+  CONSTRAINT fk_history_cloth FOREIGN KEY (cloth_id) REFERENCES clothes(cloth_id) ON DELETE CASCADE,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (history_id, worn_date)
+) PARTITION BY RANGE (worn_date);
+
+COMMENT ON TABLE worn_history IS '服の着用履歴。wash_cycle に基づく提案除外判定の根拠となる。';
+COMMENT ON COLUMN worn_history.worn_date IS '着用日（DATE）。この日付から wash_cycle_days を計算して提案除外する。';
+
+CREATE OR REPLACE FUNCTION ensure_worn_history_partitions(from_month DATE, months INTEGER) RETURNS void AS $$
+DECLARE
+  m DATE;
+BEGIN
+  FOR i IN 0..months - 1 LOOP
+    m := (date_trunc('month', from_month) + make_interval(months => i))::date;
+    EXECUTE format(
+      'CREATE TABLE IF NOT EXISTS %I PARTITION OF worn_history FOR VALUES FROM (%L) TO (%L)',
+      'worn_history_' || to_char(m, 'YYYYMM'), m, (m + interval '1 month')::date
+    );
+  END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 既存データの最古月から 3 ヶ月先までのパーティションを作成（データが無ければ過去 12 ヶ月から）
+SELECT ensure_worn_history_partitions(
+  start_month,
+  ((extract(year FROM age(end_month, start_month)) * 12 + extract(month FROM age(end_month, start_month)))::int + 1)
+)
+FROM (
+  SELECT
+    date_trunc('month', coalesce(min(worn_date), current_date - interval '12 months'))::date AS start_month,
+    date_trunc('month', current_date + interval '3 months')::date AS end_month
+  FROM worn_history_legacy
+) r;
+CREATE TABLE IF NOT EXISTS worn_history_default PARTITION OF worn_history DEFAULT;
+
+-- インデックスはデータ投入後に作成した方が速い
+INSERT INTO worn_history (history_id, cloth_id, worn_date, updated_at)
+SELECT DISTINCT ON (cloth_id, worn_date) history_id, cloth_id, worn_date, updated_at
+FROM worn_history_legacy
+ORDER BY cloth_id, worn_date, updated_at;
+
+CREATE INDEX IF NOT EXISTS idx_worn_history_cloth_id ON worn_history(cloth_id);
+CREATE INDEX IF NOT EXISTS idx_worn_history_worn_date ON worn_history(worn_date);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_worn_history_cloth_date ON worn_history(cloth_id, worn_date);
+
+CREATE TRIGGER trg_worn_history_set_updated_at BEFORE UPDATE ON worn_history FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+ANALYZE clothes;
+ANALYZE worn_history;
+
+COMMIT;
+
+-- 確認後:
+-- DROP TABLE worn_history_legacy;
+
+-- EOF
@@ -0,0 +1,19 @@
+-- SmartOutfit: 既存 DB の移行
+-- ファイル: migrations/002_clothes_thumbnails.sql
+-- 用途: clothes に派生画像 (サムネイル) の URL 列を追加する
+-- 新規 DB は init_db.sql に反映済みなので、この移行は不要です。
+--
+-- 実行例: psql "$DATABASE_URL" -v ON_ERROR_STOP=1 -f migrations/002_clothes_thumbnails.sql
+--
+-- 既存の服は thumbnails = '{}' のままで、クライアントは image_url（原寸）にフォールバックします。
+-- 定数のデフォルト値を持つ列の追加はテーブルの書き換えを伴わないため、すぐに終わります。
+
+BEGIN;
+
+ALTER TABLE clothes ADD COLUMN IF NOT EXISTS thumbnails JSONB NOT NULL DEFAULT '{}'::jsonb;
+
+COMMENT ON COLUMN clothes.thumbnails IS '内容ハッシュ名の派生画像 URL（sm: 一覧用 256px, md: 詳細・Vision 用 512px）。';
+
+COMMIT;
+
+-- EOF
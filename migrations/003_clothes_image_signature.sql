@@ -0,0 +1,22 @@
+-- SmartOutfit: 既存 DB の移行
+-- ファイル: migrations/003_clothes_image_signature.sql
+-- 用途: clothes に画像の知覚ハッシュと色ヒストグラムの列を追加する（近似重複の検出・類似検索用）
+-- 新規 DB は init_db.sql に反映済みなので、この移行は不要です。
+--
+-- 実行例: psql "$DATABASE_URL" -v ON_ERROR_STOP=1 -f migrations/003_clothes_image_signature.sql
+--
+-- 既存の服は NULL のままで、類似検索と features の流用の対象外になります（画像の再アップロードで計算されます）。
+-- デフォルト値の無い NULL 許容列の追加はテーブルの書き換えを伴わないため、すぐに終わります。
+-- 索引はユーザー単位で clothes(user_id) から読むため、新しいインデックスは不要です。
+
+BEGIN;
+
+ALTER TABLE clothes ADD COLUMN IF NOT EXISTS phash BIGINT DEFAULT NULL;
+ALTER TABLE clothes ADD COLUMN IF NOT EXISTS color_hist BYTEA DEFAULT NULL;
+
+COMMENT ON COLUMN clothes.phash IS 'アップロード画像の dHash（64 ビットを符号付きで格納）。NULL は未計算（取り込み・移行前の画像）。';
+COMMENT ON COLUMN clothes.color_hist IS '色ヒストグラム（64 ビン × 1 バイト）。phash と組み合わせて同じ服の撮り直しを判定する。';
+
+COMMIT;
+
+-- EOF
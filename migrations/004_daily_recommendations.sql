@@ -0,0 +1,39 @@
+-- SmartOutfit: 既存 DB の移行
+-- ファイル: migrations/004_daily_recommendations.sql
+-- 用途: 日次の事前計算コーデ（daily_recommendations）と、その対象選び用の users の列を追加する
+-- 新規 DB は init_db.sql に反映済みなので、この移行は不要です。
+--
+-- 実行例: psql "$DATABASE_URL" -v ON_ERROR_STOP=1 -f migrations/004_daily_recommendations.sql
+--
+-- users.last_active_date / last_geohash は移行後の最初の POST /recommend で埋まるため、
+-- バッチの対象になるのはそれ以降に使われたユーザーだけです。
+-- インデックスは CONCURRENTLY で作るためトランザクションの外で実行します。
+
+BEGIN;
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS last_active_date DATE DEFAULT NULL;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS last_geohash TEXT DEFAULT NULL;
+
+COMMENT ON COLUMN users.last_geohash IS '最後の POST /recommend の位置（geohash）。日次の事前計算はこのセルの天気で行う。';
+
+CREATE TABLE IF NOT EXISTS daily_recommendations (
+  user_id UUID NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+  rec_date DATE NOT NULL,
+  geohash TEXT NOT NULL,
+  weather TEXT NOT NULL,
+  temp_c DOUBLE PRECISION NOT NULL,
+  wash_cycle_days INTEGER NOT NULL,
+  clothes_count INTEGER NOT NULL,
+  clothes_updated_at TIMESTAMPTZ DEFAULT NULL,
+  response JSONB NOT NULL,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (user_id, rec_date)
+);
+
+COMMENT ON TABLE daily_recommendations IS '日次バッチで事前計算した RecommendResponse。入力が変わった場合は使われず、翌日のバッチで削除される。';
+
+COMMIT;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_last_active ON users(last_active_date) WHERE last_geohash IS NOT NULL;
+
+-- EOF
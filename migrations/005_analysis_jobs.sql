@@ -0,0 +1,47 @@
+-- SmartOutfit: 既存 DB の移行
+-- ファイル: migrations/005_analysis_jobs.sql
+-- 用途: 非同期の画像解析ジョブのキュー（analysis_jobs）を追加する
+-- 新規 DB は init_db.sql に反映済みなので、この移行は不要です。
+--
+-- 実行例: psql "$DATABASE_URL" -v ON_ERROR_STOP=1 -f migrations/005_analysis_jobs.sql
+--
+-- init_db.sql の CREATE TRIGGER は IF NOT EXISTS を持たないため、既存 DB で再実行すると失敗します。
+-- この移行は何度実行しても同じ結果になります。テーブルは新規なので、インデックスもトランザクション内で作ります。
+-- 既存の服に解析ジョブは作りません（features が入っている服は解析済みです）。
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS analysis_jobs (
+  job_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  cloth_id UUID NOT NULL UNIQUE REFERENCES clothes(cloth_id) ON DELETE CASCADE,
+  image_url TEXT NOT NULL,
+  status TEXT NOT NULL DEFAULT 'PENDING' CHECK (status IN ('PENDING', 'RUNNING', 'DONE', 'FAILED')),
+  attempts INTEGER NOT NULL DEFAULT 0,
+  -- 次に実行可能になる時刻（リトライ時はバックオフ分だけ未来に設定）
+  run_after TIMESTAMPTZ NOT NULL DEFAULT now(),
+  -- RUNNING ジョブのリース期限。これを過ぎたジョブは別ワーカーが再取得できる
+  locked_until TIMESTAMPTZ DEFAULT NULL,
+  last_error TEXT,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+COMMENT ON TABLE analysis_jobs IS '非同期の画像解析ジョブ。ワーカーが FOR UPDATE SKIP LOCKED で取り出す。';
+
+-- 未完了ジョブだけを対象にした部分インデックス（キューの取り出し用）
+CREATE INDEX IF NOT EXISTS idx_analysis_jobs_runnable ON analysis_jobs(run_after) WHERE status IN ('PENDING', 'RUNNING');
+
+-- updated_at の自動更新（関数は init_db.sql と同じ）
+CREATE OR REPLACE FUNCTION set_updated_at() RETURNS trigger AS $$
+BEGIN
+  NEW.updated_at = now();
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_analysis_jobs_set_updated_at ON analysis_jobs;
+CREATE TRIGGER trg_analysis_jobs_set_updated_at BEFORE UPDATE ON analysis_jobs FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+COMMIT;
+
+-- EOF
@@ -0,0 +1,31 @@
+-- SmartOutfit: 既存 DB の移行
+-- ファイル: migrations/006_feature_cache.sql
+-- 用途: Vision API の解析結果キャッシュ（feature_cache）を追加する
+-- 新規 DB は init_db.sql に反映済みなので、この移行は不要です。
+--
+-- 実行例: psql "$DATABASE_URL" -v ON_ERROR_STOP=1 -f migrations/006_feature_cache.sql
+--
+-- キャッシュは空の状態で始まり、移行後の解析結果から溜まっていきます。
+-- テーブルは新規なので、インデックスもトランザクション内で作ります。
+
+BEGIN;
+
+-- 画像内容の SHA-256 とモデル名・プロンプトのバージョンをキーに、Vision API の解析結果を保存する。
+-- プロンプトを変更するとバージョンが変わるため、古いエントリは参照されなくなり purge で削除される。
+CREATE TABLE IF NOT EXISTS feature_cache (
+  content_hash TEXT NOT NULL,
+  model TEXT NOT NULL,
+  prompt_version TEXT NOT NULL,
+  features JSONB NOT NULL,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (content_hash, model, prompt_version)
+);
+
+COMMENT ON TABLE feature_cache IS 'Vision API の解析結果キャッシュ。TTL 切れとプロンプト変更で無効化される。';
+
+-- TTL による削除用
+CREATE INDEX IF NOT EXISTS idx_feature_cache_created_at ON feature_cache(created_at);
+
+COMMIT;
+
+-- EOF
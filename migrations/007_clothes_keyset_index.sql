@@ -0,0 +1,14 @@
+-- SmartOutfit: 既存 DB の移行
+-- ファイル: migrations/007_clothes_keyset_index.sql
+-- 用途: GET /clothes のキーセットページング用インデックスを追加する
+-- 新規 DB は init_db.sql に反映済みなので、この移行は不要です。
+--
+-- 実行例: psql "$DATABASE_URL" -v ON_ERROR_STOP=1 -f migrations/007_clothes_keyset_index.sql
+--
+-- 書き込みを止めないよう CONCURRENTLY で作るため、トランザクションの外で実行します。
+-- 途中で失敗すると INVALID なインデックスが残るので、DROP INDEX CONCURRENTLY してから再実行してください。
+
+-- ORDER BY created_at DESC, cloth_id DESC と一致させる
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_clothes_user_active_created ON clothes(user_id, created_at DESC, cloth_id DESC) WHERE status = 'ACTIVE';
+
+-- EOF
@@ -0,0 +1,13 @@
+-- SmartOutfit: 既存 DB の移行
+-- ファイル: migrations/008_clothes_sync_index.sql
+-- 用途: 差分同期 (GET /clothes/changes) と GET /clothes の ETag 計算（件数・max(updated_at)）用のインデックスを追加する
+-- 新規 DB は init_db.sql に反映済みなので、この移行は不要です。
+--
+-- 実行例: psql "$DATABASE_URL" -v ON_ERROR_STOP=1 -f migrations/008_clothes_sync_index.sql
+--
+-- 書き込みを止めないよう CONCURRENTLY で作るため、トランザクションの外で実行します。
+-- 途中で失敗すると INVALID なインデックスが残るので、DROP INDEX CONCURRENTLY してから再実行してください。
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_clothes_user_updated ON clothes(user_id, updated_at, cloth_id);
+
+-- EOF
@@ -0,0 +1,29 @@
+-- SmartOutfit: 既存 DB の移行
+-- ファイル: migrations/009_wardrobe_changed_notify.sql
+-- 用途: 服の変更を wardrobe_changed チャンネルに通知するトリガーを追加する（ワーカー間のキャッシュ無効化用）
+-- 新規 DB は init_db.sql に反映済みなので、この移行は不要です。
+--
+-- 実行例: psql "$DATABASE_URL" -v ON_ERROR_STOP=1 -f migrations/009_wardrobe_changed_notify.sql
+--
+-- 移行前から動いている API プロセスは、再起動して LISTEN を始めるまで他プロセスの変更を TTL まで見逃します。
+-- 何度実行しても同じ結果になります。
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION notify_wardrobe_changed() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'DELETE' THEN
+    PERFORM pg_notify('wardrobe_changed', OLD.user_id::text);
+  ELSE
+    PERFORM pg_notify('wardrobe_changed', NEW.user_id::text);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_clothes_notify_wardrobe_changed ON clothes;
+CREATE TRIGGER trg_clothes_notify_wardrobe_changed AFTER INSERT OR UPDATE OR DELETE ON clothes FOR EACH ROW EXECUTE FUNCTION notify_wardrobe_changed();
+
+COMMIT;
+
+-- EOF
@@ -2,7 +2,7 @@ from __future__ import annotations
 import uuid
 from datetime import datetime, date
 from typing import Any
-from sqlalchemy import Column, String, Integer, DateTime, Date, ForeignKey, Enum
+from sqlalchemy import Column, String, Integer, BigInteger, Float, LargeBinary, DateTime, Date, ForeignKey, Enum, func
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID, JSONB
 from sqlalchemy.orm import relationship, declarative_base
 
@@ -17,6 +17,10 @@ class User(Base):
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
     updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
 
+    # 最後に /recommend を使った日と天気バケット (geohash)。日次の事前計算の対象選びに使う
+    last_active_date = Column(Date, nullable=True)
+    last_geohash = Column(String, nullable=True)
+
     # 追加: 外部認証プロバイダ関連
     auth_provider_id = Column(String, unique=True, nullable=True)
     auth_providers = relationship("UserAuthProvider", back_populates="user", cascade="all, delete-orphan")
@@ -32,10 +36,19 @@ class Cloth(Base):
     image_url = Column(String, nullable=False)
     category = Column(String, nullable=False)
     features = Column(JSONB, nullable=False)
+    # 派生画像 (サムネイル) の URL: {"sm": url, "md": url}
+    thumbnails = Column(JSONB, nullable=False, default=dict, server_default="{}")
     status = Column(String, nullable=False, default="ACTIVE")
-    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
-    deleted_at = Column(DateTime, nullable=True)
-    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    # 時刻は DB の now() だけで決める (トリガーと COPY も now() を使うので、同期トークンやカーソルの比較がずれない)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    # worn_history の非正規化 (POST /wear が同じトランザクションで更新)
+    last_worn_date = Column(Date, nullable=True)
+    wear_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # 画像の知覚ハッシュ (dHash, 64 ビット) と色ヒストグラム (64 バイト)。近似重複の検出用
+    phash = Column(BigInteger, nullable=True)
+    color_hist = Column(LargeBinary, nullable=True)
 
     user = relationship("User", back_populates="clothes")
     worn_history = relationship("WornHistory", back_populates="cloth", cascade="all, delete-orphan")
@@ -44,9 +57,10 @@ class Cloth(Base):
 class WornHistory(Base):
     __tablename__ = "worn_history"
 
+    # worn_date でレンジパーティションしているため、主キーにパーティションキーを含める
     history_id = Column(PG_UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     cloth_id = Column(PG_UUID(as_uuid=True), ForeignKey("clothes.cloth_id", ondelete="CASCADE"), nullable=False)
-    worn_date = Column(Date, nullable=False)
+    worn_date = Column(Date, primary_key=True, nullable=False)
     updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
 
     cloth = relationship("Cloth", back_populates="worn_history")
@@ -63,3 +77,45 @@ class UserAuthProvider(Base):
     updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
 
     user = relationship("User", back_populates="auth_providers")
+
+
+class AnalysisJob(Base):
+    __tablename__ = "analysis_jobs"
+
+    job_id = Column(PG_UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    cloth_id = Column(PG_UUID(as_uuid=True), ForeignKey("clothes.cloth_id", ondelete="CASCADE"), nullable=False, unique=True)
+    image_url = Column(String, nullable=False)
+    # PENDING / RUNNING / DONE / FAILED
+    status = Column(String, nullable=False, default="PENDING")
+    attempts = Column(Integer, nullable=False, default=0)
+    run_after = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    locked_until = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class FeatureCacheEntry(Base):
+    __tablename__ = "feature_cache"
+
+    content_hash = Column(String, primary_key=True)
+    model = Column(String, primary_key=True)
+    prompt_version = Column(String, primary_key=True)
+    features = Column(JSONB, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class DailyRecommendation(Base):
+    __tablename__ = "daily_recommendations"
+
+    user_id = Column(PG_UUID(as_uuid=True), ForeignKey("users.user_id", ondelete="CASCADE"), primary_key=True)
+    rec_date = Column(Date, primary_key=True)
+    # 計算に使った入力。/recommend はこれが現在と一致する場合だけ response を返す
+    geohash = Column(String, nullable=False)
+    weather = Column(String, nullable=False)
+    temp_c = Column(Float, nullable=False)
+    wash_cycle_days = Column(Integer, nullable=False)
+    clothes_count = Column(Integer, nullable=False)
+    clothes_updated_at = Column(DateTime(timezone=True), nullable=True)
+    response = Column(JSONB, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
@@ -1,8 +1,8 @@
 from __future__ import annotations
-from typing import List, Optional, Any
+from typing import Dict, List, Optional, Any, Literal
 from uuid import UUID
 from datetime import date
-from pydantic import BaseModel, Field, Json
+from pydantic import BaseModel, Field, Json, validator
 
 
 class FeatureSchema(BaseModel):
@@ -23,6 +23,8 @@ class ClothOut(BaseModel):
     cloth_id: UUID
     user_id: UUID
     image_url: str
+    # 派生画像の URL (sm: 一覧用, md: 詳細用)。生成できなかった場合は空で、image_url を使う
+    thumbnails: Dict[str, str] = {}
     category: str
     features: FeatureSchema
     status: str
@@ -31,6 +33,35 @@ class ClothOut(BaseModel):
         orm_mode = True
 
 
+class SimilarClothOut(ClothOut):
+    # 知覚ハッシュの異なるビット数 (0..64) と色ヒストグラムの L1 距離 (0..2)
+    distance: int
+    color_distance: float
+
+
+def cloth_out_dict(row: Any) -> dict:
+    """
+    JSON-ready dict in the shape of ClothOut, built straight from a row/object with the
+    ClothOut attributes. Skips pydantic validation for list endpoints; features are
+    normalized to the FeatureSchema keys and defaults the same way ClothOut would.
+    """
+    f = row.features or {}
+    return {
+        "cloth_id": str(row.cloth_id),
+        "user_id": str(row.user_id),
+        "image_url": row.image_url,
+        "thumbnails": row.thumbnails or {},
+        "category": row.category,
+        "features": {name: f.get(name, field.get_default()) for name, field in FeatureSchema.__fields__.items()},
+        "status": row.status,
+    }
+
+
+class ClothStatusUpdate(BaseModel):
+    user_id: UUID
+    status: Literal["ACTIVE", "LAUNDRY", "DISCARDED"]
+
+
 class RecommendRequest(BaseModel):
     user_id: UUID
     latitude: float
@@ -38,11 +69,109 @@ class RecommendRequest(BaseModel):
     tpo: Optional[str] = None
 
 
+class OutfitOut(BaseModel):
+    clothes: List[ClothOut]
+    reason: str
+    score: Optional[float] = None
+
+
 class RecommendResponse(BaseModel):
     clothes: List[ClothOut]
     reason: str
+    # 次点の組み合わせ (「別の提案」はこれを順に表示すれば再リクエスト不要)
+    alternatives: List[OutfitOut] = []
+
+
+NO_CANDIDATES_REASON = "候補となる服が見つかりませんでした。"
+
+
+def recommend_response(user_id: UUID, ai_result: Dict[str, Any], by_id: Dict[str, Any]) -> RecommendResponse:
+    """
+    RecommendResponse from a stylist result. Selected items are resolved against the candidate
+    rows (`by_id`: str(cloth_id) -> row with the CandidateRow attributes), so nothing is re-read.
+    """
+
+    def clothes(selected: list) -> List[ClothOut]:
+        out = []
+        seen = set()
+        for s in selected:
+            cid = s.get("cloth_id") if isinstance(s, dict) else s
+            row = by_id.get(str(cid)) if cid is not None else None
+            if row is None or row.cloth_id in seen:
+                continue
+            seen.add(row.cloth_id)
+            out.append(ClothOut(
+                cloth_id=row.cloth_id, user_id=user_id, image_url=row.image_url, thumbnails=row.thumbnails or {},
+                category=row.category, features=row.features, status="ACTIVE",
+            ))
+        return out
+
+    return RecommendResponse(
+        clothes=clothes(ai_result.get("selected", [])),
+        reason=ai_result.get("reason", ""),
+        alternatives=[
+            OutfitOut(clothes=clothes(alt.get("selected", [])), reason=alt.get("reason", ""), score=alt.get("score"))
+            for alt in ai_result.get("alternatives", [])
+        ],
+    )
+
+
+def _not_in_future(value: Optional[date]) -> Optional[date]:
+    # 未来日は worn_history の default パーティションに入り、その月のパーティション作成を妨げる。
+    # last_worn_date も未来になり、その日まで服が提案から外れてしまう
+    if value is not None and value > date.today():
+        raise ValueError("date must not be in the future")
+    return value
 
 
 class WearRequest(BaseModel):
     user_id: UUID
     cloth_ids: List[UUID]
+    # 省略時は当日
+    worn_date: Optional[date] = None
+
+    _check_worn_date = validator("worn_date", allow_reuse=True)(_not_in_future)
+
+
+class ClothImportItem(BaseModel):
+    image_url: str
+    category: str
+    # 省略時は解析ジョブを作り、ワーカーが後で解析する
+    features: Optional[FeatureSchema] = None
+    status: Literal["ACTIVE", "LAUNDRY", "DISCARDED"] = "ACTIVE"
+    worn_dates: List[date] = []
+
+    _check_worn_dates = validator("worn_dates", each_item=True, allow_reuse=True)(_not_in_future)
+
+
+class ClothImportRequest(BaseModel):
+    user_id: UUID
+    items: List[ClothImportItem]
+
+
+class ClothImportResult(BaseModel):
+    imported: int
+    worn_history: int
+    cloth_ids: List[UUID]
+
+
+class AnalysisStatusOut(BaseModel):
+    cloth_id: UUID
+    # PENDING / RUNNING / DONE / FAILED
+    status: str
+    attempts: int = 0
+    last_error: Optional[str] = None
+    features: Optional[FeatureSchema] = None
+
+
+class WeatherOut(BaseModel):
+    weather: str
+    temp_c: float
+
+
+class ClothChangesOut(BaseModel):
+    changed: List[ClothOut]
+    # 一覧から消えた服 (LAUNDRY / DISCARDED / 論理削除)
+    removed: List[UUID]
+    next_token: str
+    has_more: bool
@@ -3,12 +3,66 @@ import os
 import hashlib
 import json
 import asyncio
-from typing import List, Dict, Any, Optional
+import sys
+from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 import random
 
+from services import scoring
+from services.scoring import target_warmth
+from services.outfit_search import search_outfits, describe_outfit, prune_candidates
+from services.feature_cache import FeatureCache
+from services.storage import content_hash_from_url
+from services.metrics import span, AI_CALLS
+from services.governor import Governor, GovernorRejected, upstream_failure
+
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 
+VISION_MODEL = "gpt-4o"
+VISION_SYSTEM_PROMPT = "You are a professional fashion analyst."
+VISION_PROMPT = (
+    "以下のJSON形式で出力してください: "
+    "{\"color\": str, \"pattern\": str, \"material\": str, "
+    "\"warmth_level\": int(1-5), \"is_rain_ok\": bool, \"seasons\": list(str)}。 "
+    "画像を解析してファッション特徴を抽出してください。"
+)
+# プロンプトを変更するとバージョンが変わり、特徴キャッシュが自動的に無効化される
+VISION_PROMPT_VERSION = hashlib.sha256(f"{VISION_SYSTEM_PROMPT}\n{VISION_PROMPT}".encode()).hexdigest()[:16]
+
+# 画像内容ハッシュ -> features のキャッシュ (DB 層は main で configure する)
+feature_cache = FeatureCache(model=VISION_MODEL, prompt_version=VISION_PROMPT_VERSION)
+
+# OpenAI 呼び出しの共通ガード。vision と recommend は同じアカウントのレート制限を使うので 1 つを共有する
+OPENAI_MAX_CONCURRENCY = int(os.environ.get("OPENAI_MAX_CONCURRENCY", "8"))
+# 0 でレート制限なし
+OPENAI_RATE_PER_SEC = float(os.environ.get("OPENAI_RATE_PER_SEC", "5"))
+OPENAI_BURST = float(os.environ.get("OPENAI_BURST", "10"))
+# 呼び出しごとの締め切り。recommend はユーザーが待っているので短め
+OPENAI_VISION_TIMEOUT = float(os.environ.get("OPENAI_VISION_TIMEOUT", "20"))
+OPENAI_RECOMMEND_TIMEOUT = float(os.environ.get("OPENAI_RECOMMEND_TIMEOUT", "8"))
+OPENAI_BREAKER_FAILURES = int(os.environ.get("OPENAI_BREAKER_FAILURES", "5"))
+OPENAI_BREAKER_RESET = float(os.environ.get("OPENAI_BREAKER_RESET", "30"))
+
+
+def _openai_failure(exc: BaseException) -> bool:
+    # SDK の接続エラー (APITimeoutError を含む) は status_code を持たない。SDK は使うときに読み込むので sys.modules から参照する
+    openai = sys.modules.get("openai")
+    if openai is not None and isinstance(exc, openai.APIConnectionError):
+        return True
+    return upstream_failure(exc)
+
+
+openai_governor = Governor(
+    "openai",
+    max_concurrency=OPENAI_MAX_CONCURRENCY,
+    rate_per_sec=OPENAI_RATE_PER_SEC or None,
+    burst=OPENAI_BURST,
+    timeout=OPENAI_VISION_TIMEOUT,
+    failure_threshold=OPENAI_BREAKER_FAILURES,
+    reset_timeout=OPENAI_BREAKER_RESET,
+    is_failure=_openai_failure,
+)
+
 
 def _mock_analyze_image(image_path: str) -> Dict[str, Any]:
     """
@@ -44,27 +98,49 @@ def _mock_analyze_image(image_path: str) -> Dict[str, Any]:
     }
 
 
-async def analyze_image(image_path: str) -> Dict[str, Any]:
+async def analyze_image(image_path: str, fallback: bool = True, content_hash: Optional[str] = None) -> Dict[str, Any]:
     """
     Analyze image to extract features. If OPENAI_API_KEY is present, call OpenAI Vision (async).
-    Falls back to mock when API key is not present.
+    Falls back to mock when API key is not present. With `fallback=False` OpenAI errors are
+    raised instead, so callers such as the analysis job queue can retry.
+    Vision results are cached by image content hash (taken from the URL when not given).
     """
-    if OPENAI_API_KEY:
+    if get_openai_client() is not None:
         try:
-            return await analyze_image_with_openai(image_path)
-        except Exception:
-            # fallback to mock on any error
-            return _mock_analyze_image(image_path)
-    return _mock_analyze_image(image_path)
+            return await _cached_openai_vision(image_path, content_hash)
+        except Exception as e:
+            if not fallback:
+                AI_CALLS.inc("vision", "error")
+                raise
+            # fallback to mock on any error (ブレーカー作動中は上流を待たずに即フォールバック)
+            AI_CALLS.inc("vision", "rejected" if isinstance(e, GovernorRejected) else "fallback")
+            with span("ai.vision.mock"):
+                return _mock_analyze_image(image_path)
+    AI_CALLS.inc("vision", "mock")
+    with span("ai.vision.mock"):
+        return _mock_analyze_image(image_path)
 
 
 # ---------- OpenAI / production helpers (async) ----------
-if OPENAI_API_KEY:
-    try:
-        from openai import AsyncOpenAI
-        _openai_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
-    except Exception:
-        _openai_client = None
+_openai_client = None
+_openai_client_failed = False
+
+
+def get_openai_client():
+    """
+    The shared AsyncOpenAI client, created on first use so that importing this module (and
+    every worker process) does not pay for the SDK. None without an API key or the package.
+    """
+    global _openai_client, _openai_client_failed
+    if _openai_client is None and OPENAI_API_KEY and not _openai_client_failed:
+        try:
+            from openai import AsyncOpenAI
+            # 締め切りと再試行は openai_governor / ジョブキュー側で扱うので、SDK 内部の再試行は切る
+            _openai_client = AsyncOpenAI(api_key=OPENAI_API_KEY, max_retries=0)
+        except Exception as e:
+            print(f"OpenAI client unavailable, using the local fallbacks: {e}")
+            _openai_client_failed = True
+    return _openai_client if OPENAI_API_KEY else None
 
 
 async def analyze_image_with_openai(image_url: str) -> Dict[str, Any]:
@@ -72,45 +148,11 @@ async def analyze_image_with_openai(image_url: str) -> Dict[str, Any]:
     OpenAI (GPT-4o) を使って画像を解析する。
     画像認識用の正しいペイロード形式に修正済み。
     """
-    if not OPENAI_API_KEY or _openai_client is None:
+    if get_openai_client() is None:
         return _mock_analyze_image(image_url)
 
-    prompt_text = (
-        "以下のJSON形式で出力してください: "
-        "{\"color\": str, \"pattern\": str, \"material\": str, "
-        "\"warmth_level\": int(1-5), \"is_rain_ok\": bool, \"seasons\": list(str)}。 "
-        "画像を解析してファッション特徴を抽出してください。"
-    )
-
     try:
-        resp = await _openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are a professional fashion analyst."},
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt_text},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": image_url,
-                                "detail": "low"  # コスト節約のためlow推奨（十分認識できます）
-                            }
-                        }
-                    ]
-                }
-            ],
-            response_format={"type": "json_object"},
-            temperature=0.0,
-        )
-        
-        content = resp.choices[0].message.content
-        if isinstance(content, (str, bytes)):
-            return json.loads(content)
-        elif isinstance(content, dict):
-            return content
-            
+        return await _cached_openai_vision(image_url)
     except Exception as e:
         print(f"OpenAI API Error: {e}")
         # エラー時はモックにフォールバック
@@ -118,41 +160,164 @@ async def analyze_image_with_openai(image_url: str) -> Dict[str, Any]:
 
     return _mock_analyze_image(image_url)
 
+
+async def _cached_openai_vision(image_url: str, content_hash: Optional[str] = None) -> Dict[str, Any]:
+    """Vision call behind the feature cache; only successful OpenAI results are cached."""
+    content_hash = content_hash or content_hash_from_url(image_url)
+    if content_hash:
+        with span("ai.vision.cache"):
+            cached = await feature_cache.get(content_hash)
+        if cached is not None:
+            AI_CALLS.inc("vision", "cache")
+            return cached
+    with span("ai.vision.openai"):
+        features = await _openai_vision(image_url)
+    AI_CALLS.inc("vision", "openai")
+    if content_hash:
+        await feature_cache.put(content_hash, features)
+    return features
+
+
+async def _openai_vision(image_url: str) -> Dict[str, Any]:
+    """Single GPT-4o vision call. Raises on API errors or an unparseable response."""
+    client = get_openai_client()
+    resp = await openai_governor.call(lambda: client.chat.completions.create(
+        model=VISION_MODEL,
+        messages=[
+            {"role": "system", "content": VISION_SYSTEM_PROMPT},
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": VISION_PROMPT},
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": image_url,
+                            "detail": "low"  # コスト節約のためlow推奨（十分認識できます）
+                        }
+                    }
+                ]
+            }
+        ],
+        response_format={"type": "json_object"},
+        temperature=0.0,
+    ), timeout=OPENAI_VISION_TIMEOUT)
+
+    content = resp.choices[0].message.content
+    if isinstance(content, (str, bytes)):
+        return json.loads(content)
+    elif isinstance(content, dict):
+        return content
+    raise ValueError("unexpected vision response content")
+
+RECOMMEND_MODEL = "gpt-4o"
+# LLM に渡す候補はカテゴリごとにローカルのヒューリスティックで上位 K 件に絞る
+RECOMMEND_TOP_K = int(os.environ.get("OPENAI_RECOMMEND_TOP_K", "8"))
+# プロンプト全体 (system + user) の推定トークン上限
+RECOMMEND_TOKEN_BUDGET = int(os.environ.get("OPENAI_RECOMMEND_TOKEN_BUDGET", "1500"))
+RECOMMEND_SYSTEM_PROMPT = (
+    "あなたはプロのスタイリストです。候補リストと天候・気温・TPOを考慮し、最適な組み合わせをJSONで返してください。"
+    "候補は items の各行が fields の順 (id, カテゴリ番号, 色, 柄, 素材, 暖かさ1-5, 雨OK=1) で、"
+    "カテゴリ番号は cats の添字です。"
+    "出力形式: {\"selected\": [id, ...], \"reason\": str}。各カテゴリから最大1点を選んでください。"
+)
+_COMPACT_FIELDS = ["id", "cat", "color", "pattern", "material", "warmth", "rain"]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count: ~4 ASCII chars per token, ~1 token per CJK/other char."""
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+def _dumps(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def compact_candidates(
+    candidates: List[Dict[str, Any]],
+    temp_c: float,
+    weather: str,
+    tpo: Optional[str] = None,
+    top_k: int = RECOMMEND_TOP_K,
+    token_budget: int = RECOMMEND_TOKEN_BUDGET,
+) -> Tuple[Dict[str, Any], Dict[int, Dict[str, Any]]]:
+    """
+    Build the compact user message for `recommend_with_openai`.
+    Keeps the top-K per category by the local heuristic, replaces UUIDs with small integer
+    aliases, drops image URLs and encodes each item as a row, then trims the lowest-ranked rows
+    until the estimated prompt fits `token_budget`. Returns (message, alias -> candidate).
+    """
+    pruned = prune_candidates(candidates, temp_c, weather, per_category=top_k)
+    cats = list(pruned.keys())
+    # カテゴリを順番に回して並べ、予算超過で末尾を削っても各カテゴリの上位が残るようにする
+    ranked: List[Tuple[int, Dict[str, Any]]] = []
+    for rank in range(max((len(v) for v in pruned.values()), default=0)):
+        for ci, cat in enumerate(cats):
+            if rank < len(pruned[cat]):
+                ranked.append((ci, pruned[cat][rank][0]))
+
+    rows = []
+    aliases: Dict[int, Dict[str, Any]] = {}
+    for alias, (ci, item) in enumerate(ranked, start=1):
+        f = item.get("features") or {}
+        rows.append([alias, ci, f.get("color"), f.get("pattern"), f.get("material"), f.get("warmth_level"), 1 if f.get("is_rain_ok") else 0])
+        aliases[alias] = item
+
+    message: Dict[str, Any] = {"temp_c": temp_c, "weather": weather, "tpo": tpo, "cats": cats, "fields": _COMPACT_FIELDS, "items": []}
+    used = estimate_tokens(RECOMMEND_SYSTEM_PROMPT) + estimate_tokens(_dumps(message))
+    for row in rows:
+        # 行の区切りのカンマ分として +1
+        cost = estimate_tokens(_dumps(row)) + 1
+        if used + cost > token_budget and message["items"]:
+            break
+        message["items"].append(row)
+        used += cost
+    kept = {row[0] for row in message["items"]}
+    return message, {a: c for a, c in aliases.items() if a in kept}
+
+
 async def recommend_with_openai(candidates: List[Dict[str, Any]], temp_c: float, weather: str, tpo: Optional[str] = None) -> Dict[str, Any]:
     """
     Call OpenAI to get a recommended subset and reasoning. Returns dict {selected: [...], reason: str}.
     If API is not available, raises an exception.
+    Candidates are sent in the compact, token-budgeted encoding from `compact_candidates`.
     """
-    if not OPENAI_API_KEY or _openai_client is None:
+    client = get_openai_client()
+    if client is None:
         raise RuntimeError("OpenAI client not configured")
 
-    system = "あなたはプロのスタイリストです。候補リストと天候・気温・TPOを考慮し、最適な組み合わせをJSONで返してください。"
-    user_msg = {
-        "candidates": candidates,
-        "temp_c": temp_c,
-        "weather": weather,
-        "tpo": tpo,
-    }
+    user_msg, aliases = compact_candidates(candidates, temp_c, weather, tpo)
 
-    try:
-        resp = await _openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": system},
-                {"role": "user", "content": json.dumps(user_msg, ensure_ascii=False)},
-            ],
-            response_format={"type": "json_object"},
-            temperature=0.2,
-        )
-        content = resp.choices[0].message.content
-        if isinstance(content, str):
-            obj = json.loads(content)
-        else:
-            obj = content
-        # Expecting {'selected': [ { 'cloth_id': '...', ... }, ... ], 'reason': '...'}
-        return obj
-    except Exception:
-        raise
+    resp = await openai_governor.call(lambda: client.chat.completions.create(
+        model=RECOMMEND_MODEL,
+        messages=[
+            {"role": "system", "content": RECOMMEND_SYSTEM_PROMPT},
+            {"role": "user", "content": _dumps(user_msg)},
+        ],
+        response_format={"type": "json_object"},
+        temperature=0.2,
+    ), timeout=OPENAI_RECOMMEND_TIMEOUT)
+    content = resp.choices[0].message.content
+    if isinstance(content, str):
+        obj = json.loads(content)
+    else:
+        obj = content
+
+    # Expecting {'selected': [alias, ...], 'reason': '...'}; map aliases back to candidates
+    selected = []
+    for a in obj.get("selected", []):
+        if isinstance(a, dict):
+            a = a.get("id")
+        try:
+            item = aliases.get(int(a))
+        except (TypeError, ValueError):
+            item = None
+        if item is not None and item not in selected:
+            selected.append(item)
+    if not selected:
+        raise ValueError("OpenAI response selected no known candidates")
+    return {"selected": selected, "reason": obj.get("reason", "")}
 
 
 async def get_recommendation(candidates: List[Dict[str, Any]], temp_c: float, weather: str, tpo: Optional[str] = None) -> Dict[str, Any]:
@@ -161,26 +326,24 @@ async def get_recommendation(candidates: List[Dict[str, Any]], temp_c: float, we
     """
     if OPENAI_API_KEY:
         try:
-            return await recommend_with_openai(candidates, temp_c, weather, tpo)
-        except Exception:
-            return recommend_outfit(candidates, temp_c, weather, tpo)
+            with span("ai.recommend.openai"):
+                result = await recommend_with_openai(candidates, temp_c, weather, tpo)
+            AI_CALLS.inc("recommend", "openai")
+            return result
+        except Exception as e:
+            AI_CALLS.inc("recommend", "rejected" if isinstance(e, GovernorRejected) else "fallback")
+            with span("ai.recommend.heuristic"):
+                return recommend_outfit(candidates, temp_c, weather, tpo)
     else:
-        return recommend_outfit(candidates, temp_c, weather, tpo)
+        AI_CALLS.inc("recommend", "heuristic")
+        with span("ai.recommend.heuristic"):
+            return recommend_outfit(candidates, temp_c, weather, tpo)
 
 
-def _heuristic_score(item: Dict[str, Any], temp_c: float, weather: str, tpo: Optional[str]) -> float:
+def _heuristic_score(item: Dict[str, Any], temp_c: float, weather: str, tpo: Optional[str], rng: Optional[random.Random] = None) -> float:
     # Prefer warmth levels matching temp: map temp to preferred warmth
     # Define target warmth: lower temp -> higher warmth_level
-    if temp_c <= 5:
-        target = 5
-    elif temp_c <= 12:
-        target = 4
-    elif temp_c <= 18:
-        target = 3
-    elif temp_c <= 24:
-        target = 2
-    else:
-        target = 1
+    target = target_warmth(temp_c)
 
     wl = item.get("features", {}).get("warmth_level") or 3
     # score inverse distance
@@ -189,16 +352,38 @@ def _heuristic_score(item: Dict[str, Any], temp_c: float, weather: str, tpo: Opt
     if weather.lower().startswith("rain") and not item.get("features", {}).get("is_rain_ok", False):
         score -= 3
     # small random tie-breaker
-    score += random.random() * 0.5
+    score += (rng or random).random() * 0.5
     return score
 
 
-def recommend_outfit(candidates: List[Dict[str, Any]], temp_c: float, weather: str, tpo: Optional[str] = None) -> Dict[str, Any]:
+def recommend_outfit(candidates: List[Dict[str, Any]], temp_c: float, weather: str, tpo: Optional[str] = None, seed: Optional[int] = None) -> Dict[str, Any]:
     """
     Given candidate clothes (each should include `cloth_id`, `category`, `features`),
     return a curated selection and a textual reason. This uses a simple heuristic by default.
     In production, this should call OpenAI with a prompt that includes candidates and weather.
+    Whole outfits are ranked by `search_outfits`; the runners-up are returned as
+    `alternatives` so "show me another" needs no new search. Pass `seed` for reproducible ties.
     """
+    outfits = search_outfits(candidates, temp_c, weather, tpo, seed=seed)
+    if not outfits:
+        return {"selected": [], "reason": "", "alternatives": []}
+
+    slots = list(dict.fromkeys(c.get("category", "その他") for c in candidates))
+    best, rest = outfits[0], outfits[1:]
+    return {
+        "selected": list(best.items),
+        "reason": describe_outfit(best, slots),
+        "score": best.score,
+        "alternatives": [
+            {"selected": list(o.items), "reason": describe_outfit(o, slots), "score": o.score}
+            for o in rest
+        ],
+    }
+
+
+def _recommend_outfit_scalar(candidates: List[Dict[str, Any]], temp_c: float, weather: str, tpo: Optional[str] = None, seed: Optional[int] = None) -> Dict[str, Any]:
+    """Independent best-item-per-category picker (pure Python). Kept as the scoring baseline."""
+    rng = random.Random(seed) if seed is not None else None
     # group by category and pick best per category
     by_cat = {}
     for c in candidates:
@@ -208,11 +393,13 @@ def recommend_outfit(candidates: List[Dict[str, Any]], temp_c: float, weather: s
     selected = []
     reasons = []
     for cat, items in by_cat.items():
-        scores = [(item, _heuristic_score(item, temp_c, weather, tpo)) for item in items]
-        scores.sort(key=lambda x: x[1], reverse=True)
-        best = scores[0][0]
+        best, best_score = None, float("-inf")
+        for item in items:
+            score = _heuristic_score(item, temp_c, weather, tpo, rng)
+            if score > best_score:
+                best, best_score = item, score
         selected.append(best)
-        reasons.append(f"{cat}には{best['features'].get('color')}の{best['features'].get('pattern')}が合います。（候補スコア {scores[0][1]:.1f}）")
+        reasons.append(f"{cat}には{best['features'].get('color')}の{best['features'].get('pattern')}が合います。（候補スコア {best_score:.1f}）")
 
     reason_text = "\n".join(reasons)
     return {"selected": selected, "reason": reason_text}
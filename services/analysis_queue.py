@@ -0,0 +1,162 @@
+from __future__ import annotations
+import os
+import asyncio
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import select, update, and_, or_, func
+
+from models import AnalysisJob, Cloth
+from services.governor import GovernorRejected
+
+ANALYSIS_WORKERS = int(os.environ.get("ANALYSIS_WORKERS", "2"))
+MAX_ATTEMPTS = int(os.environ.get("ANALYSIS_MAX_ATTEMPTS", "5"))
+# リトライ間隔: BACKOFF_BASE * 2^(attempts-1) 秒、BACKOFF_MAX で頭打ち
+BACKOFF_BASE = 5.0
+BACKOFF_MAX = 600.0
+# RUNNING ジョブのリース。ワーカーが落ちてもこの時間が過ぎれば再取得される
+LEASE_SECONDS = 300
+
+AnalyzeFn = Callable[..., Awaitable[Dict[str, Any]]]
+
+
+def backoff_seconds(attempts: int) -> float:
+    return min(BACKOFF_MAX, BACKOFF_BASE * (2 ** max(0, attempts - 1)))
+
+
+class AnalysisWorkerPool:
+    """
+    Bounded pool of asyncio workers draining the `analysis_jobs` table.
+    Jobs are claimed with FOR UPDATE SKIP LOCKED, so several processes can share the queue.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        analyze: AnalyzeFn,
+        concurrency: int = ANALYSIS_WORKERS,
+        poll_interval: float = 2.0,
+        on_complete: Optional[Callable[[Any], None]] = None,
+    ):
+        self._session_factory = session_factory
+        self._analyze = analyze
+        # 解析完了時に user_id を渡して呼ばれる (候補キャッシュの無効化など)
+        self._on_complete = on_complete
+        self._concurrency = concurrency
+        self._poll_interval = poll_interval
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        for i in range(self._concurrency):
+            self._tasks.append(asyncio.create_task(self._run(), name=f"analysis-worker-{i}"))
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def notify(self) -> None:
+        """Wake idle workers after a new job has been committed."""
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                handled = await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"analysis worker error: {e}")
+                handled = False
+            if handled:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def run_once(self) -> bool:
+        """Claim and process a single job. Returns False when the queue is empty."""
+        job = await self._claim()
+        if job is None:
+            return False
+        job_id, cloth_id, image_url, attempts = job
+
+        try:
+            # 最終試行ではモックへのフォールバックを許可し、服が features 無しのまま残らないようにする
+            features = await self._analyze(image_url, fallback=attempts >= MAX_ATTEMPTS)
+        except GovernorRejected as e:
+            # 上流に送っていない (ブレーカー作動中・レート制限) ので試行回数は消費しない
+            await self._defer(job_id, attempts - 1, e.retry_after)
+            return True
+        except Exception as e:
+            await self._fail(job_id, attempts, repr(e))
+            return True
+
+        async with self._session_factory() as db:
+            res = await db.execute(
+                update(Cloth).where(Cloth.cloth_id == cloth_id).values(features=features).returning(Cloth.user_id)
+            )
+            user_id = res.scalar_one_or_none()
+            await db.execute(
+                update(AnalysisJob)
+                .where(AnalysisJob.job_id == job_id)
+                .values(status="DONE", locked_until=None, last_error=None)
+            )
+            await db.commit()
+        if user_id is not None and self._on_complete is not None:
+            self._on_complete(user_id)
+        return True
+
+    async def _claim(self) -> Optional[tuple]:
+        async with self._session_factory() as db:
+            stmt = (
+                select(AnalysisJob)
+                .where(
+                    or_(
+                        and_(AnalysisJob.status == "PENDING", AnalysisJob.run_after <= func.now()),
+                        and_(AnalysisJob.status == "RUNNING", AnalysisJob.locked_until < func.now()),
+                    )
+                )
+                .order_by(AnalysisJob.run_after)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )
+            res = await db.execute(stmt)
+            job = res.scalars().first()
+            if job is None:
+                return None
+            job.status = "RUNNING"
+            job.attempts = job.attempts + 1
+            job.locked_until = func.now() + timedelta(seconds=LEASE_SECONDS)
+            claimed = (job.job_id, job.cloth_id, job.image_url, job.attempts)
+            await db.commit()
+            return claimed
+
+    async def _defer(self, job_id, attempts: int, delay: float) -> None:
+        async with self._session_factory() as db:
+            await db.execute(
+                update(AnalysisJob)
+                .where(AnalysisJob.job_id == job_id)
+                .values(
+                    status="PENDING",
+                    attempts=attempts,
+                    locked_until=None,
+                    run_after=func.now() + timedelta(seconds=max(delay, self._poll_interval)),
+                )
+            )
+            await db.commit()
+
+    async def _fail(self, job_id, attempts: int, error: str) -> None:
+        values: Dict[str, Any] = {"locked_until": None, "last_error": error[:1000]}
+        if attempts >= MAX_ATTEMPTS:
+            values["status"] = "FAILED"
+        else:
+            values["status"] = "PENDING"
+            values["run_after"] = func.now() + timedelta(seconds=backoff_seconds(attempts))
+        async with self._session_factory() as db:
+            await db.execute(update(AnalysisJob).where(AnalysisJob.job_id == job_id).values(**values))
+            await db.commit()
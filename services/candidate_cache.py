@@ -0,0 +1,48 @@
+from __future__ import annotations
+import os
+from datetime import date
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+from uuid import UUID
+
+from services.user_cache import UserCache
+
+CANDIDATE_CACHE_USERS = int(os.environ.get("CANDIDATE_CACHE_USERS", "10000"))
+# 他のワーカープロセスでの更新は NOTIFY で届く (services/wardrobe_events.py)。リスナーが使えない場合に備えて、
+# 古さの上限として TTL も設ける
+CANDIDATE_CACHE_TTL = float(os.environ.get("CANDIDATE_CACHE_TTL", "600"))
+
+
+class CandidateRow(NamedTuple):
+    cloth_id: UUID
+    category: str
+    features: Dict[str, Any]
+    image_url: str
+    thumbnails: Dict[str, str]
+
+
+class _Dated(NamedTuple):
+    day: date
+    rows: Tuple[CandidateRow, ...]
+
+
+class CandidateCache(UserCache[_Dated]):
+    """
+    Per-user cache of /recommend candidates (clothes eligible today).
+    Entries are dropped at date rollover because the wash-cycle cutoff moves daily.
+    """
+
+    def __init__(self, max_users: int = CANDIDATE_CACHE_USERS, ttl_seconds: float = CANDIDATE_CACHE_TTL):
+        super().__init__(max_users, ttl_seconds)
+
+    def _fresh(self, value: _Dated) -> bool:
+        return value.day == date.today()
+
+    def get(self, user_id: UUID) -> Optional[Tuple[CandidateRow, ...]]:
+        value = super().get(user_id)
+        return None if value is None else value.rows
+
+    def put(self, user_id: UUID, rows, generation: int, day: Optional[date] = None) -> None:
+        super().put(user_id, _Dated(day or date.today(), tuple(rows)), generation)
+
+
+candidate_cache = CandidateCache()
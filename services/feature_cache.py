@@ -0,0 +1,118 @@
+from __future__ import annotations
+import os
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import select, delete, or_, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from models import FeatureCacheEntry
+
+FEATURE_CACHE_SIZE = int(os.environ.get("FEATURE_CACHE_SIZE", "10000"))
+FEATURE_CACHE_TTL = int(os.environ.get("FEATURE_CACHE_TTL", str(30 * 24 * 3600)))
+
+
+class FeatureCache:
+    """
+    Two-tier cache for vision features: an in-process LRU in front of the `feature_cache` table.
+    Entries are keyed by (content hash, model, prompt version), so changing the prompt
+    makes every old entry unreachable; `purge()` then deletes them.
+    The DB tier is optional and only used after `configure(session_factory)`.
+    """
+
+    def __init__(self, model: str, prompt_version: str, max_entries: int = FEATURE_CACHE_SIZE, ttl_seconds: int = FEATURE_CACHE_TTL):
+        self.model = model
+        self.prompt_version = prompt_version
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._session_factory = None
+        self._lru: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.counters = {"memory_hits": 0, "db_hits": 0, "misses": 0, "evictions": 0, "db_errors": 0}
+
+    def configure(self, session_factory) -> None:
+        self._session_factory = session_factory
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.counters, "size": len(self._lru)}
+
+    async def get(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        now = time.monotonic()
+        entry = self._lru.get(content_hash)
+        if entry is not None:
+            expires_at, features = entry
+            if expires_at > now:
+                self._lru.move_to_end(content_hash)
+                self.counters["memory_hits"] += 1
+                return features
+            del self._lru[content_hash]
+
+        features = await self._db_get(content_hash)
+        if features is not None:
+            self.counters["db_hits"] += 1
+            self._remember(content_hash, features)
+            return features
+        self.counters["misses"] += 1
+        return None
+
+    async def put(self, content_hash: str, features: Dict[str, Any]) -> None:
+        self._remember(content_hash, features)
+        if self._session_factory is None:
+            return
+        stmt = pg_insert(FeatureCacheEntry).values(
+            content_hash=content_hash, model=self.model, prompt_version=self.prompt_version, features=features,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["content_hash", "model", "prompt_version"],
+            set_={"features": stmt.excluded.features, "created_at": func.now()},
+        )
+        try:
+            async with self._session_factory() as db:
+                await db.execute(stmt)
+                await db.commit()
+        except Exception as e:
+            # キャッシュ書き込みの失敗で解析自体を失敗させない
+            self.counters["db_errors"] += 1
+            print(f"feature cache write failed: {e}")
+
+    async def purge(self) -> int:
+        """Delete expired rows and rows written for another model/prompt version."""
+        if self._session_factory is None:
+            return 0
+        stmt = delete(FeatureCacheEntry).where(
+            or_(
+                FeatureCacheEntry.model != self.model,
+                FeatureCacheEntry.prompt_version != self.prompt_version,
+                FeatureCacheEntry.created_at < func.now() - timedelta(seconds=self.ttl_seconds),
+            )
+        )
+        async with self._session_factory() as db:
+            res = await db.execute(stmt)
+            await db.commit()
+            return res.rowcount or 0
+
+    def _remember(self, content_hash: str, features: Dict[str, Any]) -> None:
+        self._lru[content_hash] = (time.monotonic() + self.ttl_seconds, features)
+        self._lru.move_to_end(content_hash)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    async def _db_get(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        if self._session_factory is None:
+            return None
+        stmt = select(FeatureCacheEntry.features).where(
+            FeatureCacheEntry.content_hash == content_hash,
+            FeatureCacheEntry.model == self.model,
+            FeatureCacheEntry.prompt_version == self.prompt_version,
+            FeatureCacheEntry.created_at >= func.now() - timedelta(seconds=self.ttl_seconds),
+        )
+        try:
+            async with self._session_factory() as db:
+                res = await db.execute(stmt)
+                return res.scalar_one_or_none()
+        except Exception as e:
+            self.counters["db_errors"] += 1
+            print(f"feature cache read failed: {e}")
+            return None
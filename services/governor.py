@@ -0,0 +1,250 @@
+from __future__ import annotations
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class GovernorRejected(Exception):
+    """The call was not sent upstream (breaker open, rate limited or saturated)."""
+
+    reason = "rejected"
+
+    def __init__(self, name: str, retry_after: float = 0.0):
+        super().__init__(f"{name}: {self.reason}")
+        # 再試行までの目安 (秒)。ジョブキューのスケジュールに使う
+        self.retry_after = retry_after
+
+
+class CircuitOpen(GovernorRejected):
+    reason = "circuit_open"
+
+
+class RateLimited(GovernorRejected):
+    reason = "rate_limited"
+
+
+class Saturated(GovernorRejected):
+    reason = "saturated"
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """The upstream call did not finish within its deadline (counts as a failure)."""
+
+
+def upstream_failure(exc: BaseException) -> bool:
+    """
+    Default breaker classification: timeouts, connection errors, 429 and 5xx count as upstream
+    failures. Other HTTP errors (400/401/404 ...) and local exceptions are the caller's problem.
+    """
+    status = getattr(exc, "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError))
+
+
+class TokenBucket:
+    """`rate` tokens per second up to `burst`. rate=None disables the limit."""
+
+    def __init__(self, rate: Optional[float], burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self) -> float:
+        """Seconds until one token is available (0 when one is available now)."""
+        if self.rate is None:
+            return 0.0
+        self._refill()
+        return 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+
+    async def acquire(self, max_wait: float) -> bool:
+        """Take a token, waiting up to `max_wait` seconds. Returns False if it would take longer."""
+        if self.rate is None:
+            return True
+        wait = self.wait_time()
+        if wait > 0 and wait > max_wait:
+            return False
+        # 待つ分も先に予約しておき、後続が同じトークンを取り合わないようにする
+        self._tokens -= 1
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return True
+
+    @property
+    def tokens(self) -> float:
+        if self.rate is None:
+            return float("inf")
+        self._refill()
+        return self._tokens
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures; while open, calls are rejected
+    immediately. After `reset_timeout` seconds one probe call is let through (half-open):
+    success closes the breaker, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_inflight = False
+        self.transitions = {OPEN: 0, HALF_OPEN: 0, CLOSED: 0}
+
+    def _set(self, state: str) -> None:
+        if state != self.state:
+            self.state = state
+            self.transitions[state] += 1
+
+    def retry_after(self) -> float:
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self) -> bool:
+        if self.state == OPEN:
+            if self.retry_after() > 0:
+                return False
+            self._set(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            # 半開状態では同時に 1 件だけ様子見を通す
+            if self._probe_inflight:
+                return False
+            self._probe_inflight = True
+        return True
+
+    def release(self) -> None:
+        """The allowed call was not sent after all (rejected by a later limit)."""
+        self._probe_inflight = False
+
+    def record_success(self) -> None:
+        self._probe_inflight = False
+        self.consecutive_failures = 0
+        self._set(CLOSED)
+
+    def record_failure(self) -> None:
+        self._probe_inflight = False
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self._set(OPEN)
+
+
+class Governor:
+    """
+    Shared guard for an upstream API: circuit breaker, token-bucket rate limit, a cap on
+    in-flight calls and a per-call deadline. Rejections raise GovernorRejected without calling
+    upstream, so callers can fall back to a local path immediately.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int = 8,
+        rate_per_sec: Optional[float] = None,
+        burst: Optional[float] = None,
+        timeout: float = 20.0,
+        queue_timeout: float = 1.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        is_failure: Callable[[BaseException], bool] = upstream_failure,
+    ):
+        self.name = name
+        # 例外をブレーカーの失敗として数えるかどうか (リクエスト側の誤りで開かないようにする)
+        self.is_failure = is_failure
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        # 空きスロット・レート制限のトークンを待つ上限。これを超えるなら待たずにフォールバックさせる
+        self.queue_timeout = queue_timeout
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.bucket = TokenBucket(rate_per_sec, burst if burst is not None else max(1.0, rate_per_sec or 1.0))
+        self._sem = asyncio.Semaphore(max_concurrency)
+        self.inflight = 0
+        self.counters = {
+            "calls": 0, "successes": 0, "failures": 0, "timeouts": 0, "client_errors": 0,
+            "rejected_circuit_open": 0, "rejected_rate_limited": 0, "rejected_saturated": 0,
+        }
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            **self.counters,
+            "state": self.breaker.state,
+            "inflight": self.inflight,
+            "consecutive_failures": self.breaker.consecutive_failures,
+            "opened_total": self.breaker.transitions[OPEN],
+            "tokens": self.bucket.tokens,
+        }
+
+    def _reject(self, exc_type) -> GovernorRejected:
+        self.counters[f"rejected_{exc_type.reason}"] += 1
+        return exc_type(self.name, retry_after=max(self.breaker.retry_after(), self.bucket.wait_time()))
+
+    async def call(self, fn: Callable[[], Awaitable[T]], timeout: Optional[float] = None) -> T:
+        """Run `fn()` under the governor. `timeout` overrides the default deadline for this call."""
+        if not self.breaker.allow():
+            raise self._reject(CircuitOpen)
+        deadline = time.monotonic() + (timeout if timeout is not None else self.timeout)
+        sent = False
+        try:
+            try:
+                await asyncio.wait_for(self._sem.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise self._reject(Saturated)
+            try:
+                # 空きを待つ間にブレーカーが開いていれば送らない
+                if self.breaker.state == OPEN:
+                    raise self._reject(CircuitOpen)
+                if not await self.bucket.acquire(min(self.queue_timeout, deadline - time.monotonic())):
+                    raise self._reject(RateLimited)
+                sent = True
+                return await self._send(fn, deadline)
+            finally:
+                self._sem.release()
+        finally:
+            # 上流に送らなかった呼び出しは、半開状態の様子見枠を返す
+            if not sent:
+                self.breaker.release()
+
+    async def _send(self, fn: Callable[[], Awaitable[T]], deadline: float) -> T:
+        self.counters["calls"] += 1
+        self.inflight += 1
+        try:
+            result = await asyncio.wait_for(fn(), timeout=max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            self.counters["timeouts"] += 1
+            self.counters["failures"] += 1
+            self.breaker.record_failure()
+            raise DeadlineExceeded(f"{self.name}: deadline exceeded")
+        except asyncio.CancelledError:
+            # 呼び出し側の都合での中断は上流の失敗として数えない
+            self.breaker.release()
+            raise
+        except Exception as e:
+            if not self.is_failure(e):
+                # 上流は応答している (不正なリクエストなど) ので、ブレーカーには数えずにそのまま返す
+                self.counters["client_errors"] += 1
+                self.breaker.release()
+                raise
+            self.counters["failures"] += 1
+            self.breaker.record_failure()
+            raise
+        finally:
+            self.inflight -= 1
+        self.counters["successes"] += 1
+        self.breaker.record_success()
+        return result
@@ -0,0 +1,48 @@
+"""
+Deferred imports of optional heavy dependencies (NumPy, Pillow).
+
+`optional_import(name)` replaces the `try: import X / except ImportError: X = None` pattern:
+it only looks the module up, and the module is executed on its first attribute access. Code
+keeps checking `X is None` for "not installed". A process that never scores a large wardrobe or
+decodes an image never loads them; a preforking server calls `load_all()` in the master
+instead, so the workers share one copy.
+"""
+from __future__ import annotations
+import importlib.util
+import sys
+from types import ModuleType
+from typing import Dict, List, Optional
+
+_deferred: Dict[str, ModuleType] = {}
+
+
+def optional_import(name: str) -> Optional[ModuleType]:
+    """`name` as a lazily executed module, or None when it is not installed."""
+    if name in sys.modules:
+        return sys.modules[name]
+    try:
+        spec = importlib.util.find_spec(name)
+    except (ImportError, ValueError):  # 親パッケージ (PIL など) が無い場合
+        spec = None
+    if spec is None or spec.loader is None:
+        return None
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    _deferred[name] = module
+    return module
+
+
+def load_all() -> List[str]:
+    """Execute every module deferred so far; returns the names that loaded."""
+    loaded = []
+    for name, module in list(_deferred.items()):
+        try:
+            # 任意の属性アクセスで LazyLoader が本体を実行する
+            getattr(module, "__dict__")
+        except Exception as e:
+            print(f"preloading {name} failed: {e}")
+            continue
+        loaded.append(name)
+    return loaded
@@ -0,0 +1,322 @@
+"""
+In-process metrics exposed in the Prometheus text format (GET /metrics).
+
+* counters / histograms with fixed label names (no client library needed)
+* `span(stage)` times a stage of the current request; the per-request breakdown is kept in a
+  contextvar so the HTTP middleware can log it for slow requests
+* collectors pull gauges (pool usage, cache stats, OpenAI governor state) at scrape time
+
+METRICS_ENABLED=0 turns every record call into an early return and leaves the request
+middleware out of the app.
+"""
+from __future__ import annotations
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1").lower() not in ("0", "false", "no")
+# これ以上かかったリクエストをステージ内訳付きでログ出力する (0 で無効)
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", "0"))
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# (name, labels, value) の並び。suffix 付きの系列 (_bucket など) は name に含める
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+class _Family:
+    def __init__(self, name: str, kind: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def samples(self) -> Iterable[Sample]:
+        raise NotImplementedError
+
+
+class Counter(_Family):
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, "counter", help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        if not METRICS_ENABLED:
+            return
+        self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def samples(self) -> Iterable[Sample]:
+        for lv, v in self._values.items():
+            yield self.name, dict(zip(self.labelnames, lv)), v
+
+
+class Histogram(_Family):
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, "histogram", help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labelvalues -> [バケットごとの件数 (累積ではない)..., +Inf の件数, 合計]
+        self._data: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        if not METRICS_ENABLED:
+            return
+        d = self._data.get(labelvalues)
+        if d is None:
+            d = self._data[labelvalues] = [0.0] * (len(self.buckets) + 2)
+        d[bisect_left(self.buckets, value)] += 1
+        d[-1] += value
+
+    def samples(self) -> Iterable[Sample]:
+        for lv, d in self._data.items():
+            labels = dict(zip(self.labelnames, lv))
+            cumulative = 0.0
+            for le, n in zip(self.buckets + (float("inf"),), d[:-1]):
+                cumulative += n
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(le)}, cumulative
+            yield f"{self.name}_sum", labels, d[-1]
+            yield f"{self.name}_count", labels, cumulative
+
+
+class _Collected(_Family):
+    """Family produced by a collector callback at scrape time."""
+
+    def __init__(self, name: str, kind: str, help: str):
+        super().__init__(name, kind, help)
+        self._samples: List[Sample] = []
+
+    def samples(self) -> Iterable[Sample]:
+        return self._samples
+
+
+# collector は (name, kind, help, labels, value) を返す
+Collector = Callable[[], Iterable[Tuple[str, str, str, Dict[str, str], float]]]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._families: Dict[str, _Family] = {}
+        self._collectors: List[Collector] = []
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._families.setdefault(name, Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._families.setdefault(name, Histogram(name, help, labelnames, buckets))
+
+    def register_collector(self, collector: Collector) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        families: Dict[str, _Family] = dict(self._families)
+        for collector in self._collectors:
+            try:
+                for name, kind, help, labels, value in collector():
+                    fam = families.get(name)
+                    if fam is None:
+                        fam = families[name] = _Collected(name, kind, help)
+                    fam._samples.append((name, labels, value))
+            except Exception as e:
+                print(f"metrics collector failed: {e}")
+        lines = []
+        for fam in families.values():
+            lines.append(f"# HELP {fam.name} {fam.help}")
+            lines.append(f"# TYPE {fam.name} {fam.kind}")
+            for name, labels, value in fam.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+REQUEST_SECONDS = registry.histogram(
+    "smartoutfit_http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route", "status")
+)
+STAGE_SECONDS = registry.histogram(
+    "smartoutfit_stage_duration_seconds", "Time spent in a named stage (upload, vision, db, weather, llm ...).", ("stage",)
+)
+AI_CALLS = registry.counter(
+    "smartoutfit_ai_calls_total", "AI calls by operation and the path actually taken (openai, cache, mock, fallback ...).", ("op", "path")
+)
+POOL_CHECKOUT_SECONDS = registry.histogram(
+    "smartoutfit_db_pool_checkout_seconds", "Time to obtain a DB connection from the pool (queue wait + connect)."
+)
+SLOW_REQUESTS = registry.counter(
+    "smartoutfit_slow_requests_total", "Requests slower than SLOW_REQUEST_MS.", ("route",)
+)
+
+# リクエストごとのステージ内訳 [(stage, seconds), ...]。リクエスト外 (ワーカー等) では None
+_stages: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("metrics_stages", default=None)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time a stage; recorded in the stage histogram and the current request's breakdown."""
+    if not METRICS_ENABLED:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        STAGE_SECONDS.observe(elapsed, stage)
+        stages = _stages.get()
+        if stages is not None:
+            stages.append((stage, elapsed))
+
+
+def begin_request():
+    """Start collecting spans for the current request. Returns a token for `end_request`."""
+    return _stages.set([])
+
+
+def end_request(token) -> List[Tuple[str, float]]:
+    stages = _stages.get() or []
+    _stages.reset(token)
+    return stages
+
+
+def route_label(scope: Dict[str, Any]) -> str:
+    """Route template (e.g. /clothes/{cloth_id}/analysis) so label cardinality stays bounded."""
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    if path:
+        return path
+    # StaticFiles などの Mount は root_path にマウント先が入る
+    return scope.get("root_path") or "unmatched"
+
+
+def observe_request(method: str, route: str, status: int, elapsed: float, stages: List[Tuple[str, float]]) -> None:
+    REQUEST_SECONDS.observe(elapsed, method, route, str(status))
+    if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+        SLOW_REQUESTS.inc(route)
+        print(f"slow request: {method} {route} {status} {elapsed * 1000:.0f}ms [{format_stages(stages)}]")
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware recording latency per route and status, with the span breakdown for slow
+    requests. Plain ASGI (no BaseHTTPMiddleware task and body streaming); main.create_app only
+    installs it when METRICS_ENABLED.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        token = begin_request()
+        t0 = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # ルーティング後の scope には一致したルートが入っている
+            observe_request(scope["method"], route_label(scope), status, time.perf_counter() - t0, end_request(token))
+
+
+def format_stages(stages: List[Tuple[str, float]]) -> str:
+    # 同じステージが複数回 (一括アップロードなど) あれば合計と回数にまとめる
+    totals: Dict[str, List[float]] = {}
+    for stage, elapsed in stages:
+        t = totals.setdefault(stage, [0.0, 0])
+        t[0] += elapsed
+        t[1] += 1
+    return " ".join(
+        f"{stage}={total * 1000:.1f}ms" + (f"x{int(n)}" if n > 1 else "") for stage, (total, n) in totals.items()
+    )
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Default asyncpg pool that also records how long each checkout waited."""
+
+    def _do_get(self):
+        if not METRICS_ENABLED:
+            return super()._do_get()
+        t0 = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - t0)
+
+
+def register_pool(pool, name: str = "default") -> None:
+    """
+    Expose size / checked-out / overflow of a QueuePool as gauges. `pool` may also be a callable
+    returning the current pool, or None while there is none (engines created in the lifespan).
+    """
+
+    def collect():
+        p = pool() if callable(pool) else pool
+        if p is None:
+            return
+        labels = {"pool": name}
+        yield "smartoutfit_db_pool_size", "gauge", "Configured pool size.", labels, p.size()
+        yield "smartoutfit_db_pool_checked_out", "gauge", "Connections currently checked out.", labels, p.checkedout()
+        yield "smartoutfit_db_pool_checked_in", "gauge", "Idle connections in the pool.", labels, p.checkedin()
+        yield "smartoutfit_db_pool_overflow", "gauge", "Connections opened beyond pool_size (negative while below size).", labels, p.overflow()
+
+    registry.register_collector(collect)
+
+
+def register_stats(cache: str, stats: Callable[[], Dict[str, int]], gauges: Sequence[str] = ("size", "inflight")) -> None:
+    """Expose a cache's `stats()` dict: `gauges` keys as gauges, everything else as event counters."""
+
+    def collect():
+        for key, value in stats().items():
+            if key in gauges:
+                yield f"smartoutfit_cache_{key}", "gauge", f"Current cache {key}.", {"cache": cache}, value
+            else:
+                yield "smartoutfit_cache_events_total", "counter", "Cache events (hits, misses, evictions ...).", {"cache": cache, "event": key}, value
+
+    registry.register_collector(collect)
+
+
+def register_governor(governor) -> None:
+    """Expose a services.governor.Governor: breaker state, in-flight calls, outcomes and rejections."""
+
+    def collect():
+        stats = governor.stats()
+        labels = {"upstream": governor.name}
+        for state in ("closed", "open", "half_open"):
+            yield "smartoutfit_governor_state", "gauge", "Circuit breaker state (1 for the current state).", {**labels, "state": state}, 1 if stats["state"] == state else 0
+        yield "smartoutfit_governor_inflight", "gauge", "Upstream calls in flight.", labels, stats["inflight"]
+        yield "smartoutfit_governor_tokens", "gauge", "Rate-limit tokens available.", labels, stats["tokens"]
+        yield "smartoutfit_governor_consecutive_failures", "gauge", "Consecutive upstream failures.", labels, stats["consecutive_failures"]
+        yield "smartoutfit_governor_opened_total", "counter", "Times the circuit breaker opened.", labels, stats["opened_total"]
+        for outcome in ("calls", "successes", "failures", "timeouts", "client_errors"):
+            yield "smartoutfit_governor_calls_total", "counter", "Upstream calls by outcome.", {**labels, "outcome": outcome}, stats[outcome]
+        for reason in ("circuit_open", "rate_limited", "saturated"):
+            yield "smartoutfit_governor_rejections_total", "counter", "Calls rejected without reaching upstream.", {**labels, "reason": reason}, stats[f"rejected_{reason}"]
+
+    registry.register_collector(collect)
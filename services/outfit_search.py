@@ -0,0 +1,233 @@
+from __future__ import annotations
+import heapq
+import os
+import random
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from services import scoring
+from services.scoring import target_warmth, RAIN_PENALTY, TIE_BREAK_SCALE
+
+# 組み合わせ探索の既定値 (環境変数で調整可能)
+PER_CATEGORY = int(os.environ.get("OUTFIT_PER_CATEGORY", "8"))
+BEAM_WIDTH = int(os.environ.get("OUTFIT_BEAM_WIDTH", "32"))
+MAX_OPS = int(os.environ.get("OUTFIT_MAX_OPS", "20000"))
+TIME_BUDGET_MS = float(os.environ.get("OUTFIT_TIME_BUDGET_MS", "20"))
+TOP_N = int(os.environ.get("OUTFIT_TOP_N", "5"))
+
+# スロット順: 主要カテゴリを先に決め、それ以外は出現順
+SLOT_ORDER = ["トップス", "ボトムス", "アウター"]
+# 省略可能なカテゴリ (暖かい日はアウター無しが最善になり得る)
+OPTIONAL_CATEGORIES = {"アウター"}
+# 暖かさの合計に数えるカテゴリ
+WARMTH_CATEGORIES = {"トップス", "ボトムス", "アウター"}
+
+NEUTRAL_COLORS = {"白", "黒", "ベージュ", "グレー", "ネイビー", "ブラウン"}
+# 色の相性 (順不同)。表に無い組み合わせは、中立色を含めば加点、それ以外は 0
+COLOR_PAIRS: Dict[frozenset, float] = {
+    frozenset({"赤", "緑"}): -2.0,
+    frozenset({"赤", "ピンク"}): -1.5,
+    frozenset({"青", "緑"}): -0.5,
+    frozenset({"赤", "青"}): -0.5,
+    frozenset({"白", "黒"}): 1.0,
+    frozenset({"ネイビー", "白"}): 1.0,
+    frozenset({"ベージュ", "ブラウン"}): 0.5,
+}
+NEUTRAL_BONUS = 0.5
+SAME_ACCENT_PENALTY = -0.5
+# 柄の相性 (順不同)。無地は何とでも合わせやすい
+SOLID = "無地"
+PATTERN_PAIRS: Dict[frozenset, float] = {
+    frozenset({"ストライプ", "チェック"}): -2.5,
+    frozenset({"チェック"}): -2.0,
+    frozenset({"花柄"}): -2.0,
+    frozenset({"ストライプ"}): -1.5,
+    frozenset({"花柄", "チェック"}): -2.0,
+    frozenset({"花柄", "ストライプ"}): -1.5,
+}
+SOLID_BONUS = 0.5
+# 暖かさ合計の目安からのずれ 1 段階あたりの減点
+WARMTH_WEIGHT = 1.0
+# 単品の暖かさのずれの減点 (全体の合計で主に評価するので弱め)
+ITEM_WARMTH_WEIGHT = 0.5
+
+
+class Outfit(NamedTuple):
+    items: Tuple[Dict[str, Any], ...]
+    score: float
+    warmth: float
+    required_warmth: float
+
+
+def color_compat(a: Optional[str], b: Optional[str]) -> float:
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 0.0 if a in NEUTRAL_COLORS else SAME_ACCENT_PENALTY
+    table = COLOR_PAIRS.get(frozenset({a, b}))
+    if table is not None:
+        return table
+    if a in NEUTRAL_COLORS or b in NEUTRAL_COLORS:
+        return NEUTRAL_BONUS
+    return 0.0
+
+
+def pattern_compat(a: Optional[str], b: Optional[str]) -> float:
+    if not a or not b:
+        return 0.0
+    if a == SOLID or b == SOLID:
+        return SOLID_BONUS
+    return PATTERN_PAIRS.get(frozenset({a, b}), -1.0)
+
+
+def pair_score(fa: Dict[str, Any], fb: Dict[str, Any]) -> float:
+    return color_compat(fa.get("color"), fb.get("color")) + pattern_compat(fa.get("pattern"), fb.get("pattern"))
+
+
+def required_warmth(temp_c: float, slots: Sequence[str]) -> float:
+    """Target for the summed warmth_level of an outfit at this temperature."""
+    target = target_warmth(temp_c)
+    core = sum(1 for s in slots if s in WARMTH_CATEGORIES and s not in OPTIONAL_CATEGORIES)
+    extra = max(0, target - 2) if any(s in OPTIONAL_CATEGORIES for s in slots) else 0
+    return float(target * core + extra)
+
+
+def _order_slots(categories: Sequence[str]) -> List[str]:
+    head = [c for c in SLOT_ORDER if c in categories]
+    return head + [c for c in categories if c not in head]
+
+
+def prune_candidates(
+    candidates: List[Dict[str, Any]],
+    temp_c: float,
+    weather: str,
+    per_category: int = PER_CATEGORY,
+    seed: Optional[int] = None,
+) -> Dict[str, List[Tuple[Dict[str, Any], float]]]:
+    """Keep the `per_category` best items of each category by the per-item heuristic score."""
+    if scoring.np is not None and len(candidates) >= scoring.VECTORIZE_MIN_CANDIDATES:
+        m = scoring.CandidateMatrix(candidates)
+        scores = m.scores(temp_c, weather, scoring.np.random.default_rng(seed))
+        return {
+            cat: [(m.items[int(i)], float(scores[i])) for i in top]
+            for cat, top in zip(m.categories, m.top_k(scores, per_category))
+        }
+
+    rng = random.Random(seed) if seed is not None else random
+    target = target_warmth(temp_c)
+    rainy = weather.lower().startswith("rain")
+    by_cat: Dict[str, List[Tuple[Dict[str, Any], float]]] = {}
+    for c in candidates:
+        features = c.get("features") or {}
+        score = 10 - abs(target - scoring._warmth(features))
+        if rainy and not features.get("is_rain_ok", False):
+            score -= RAIN_PENALTY
+        score += rng.random() * TIE_BREAK_SCALE
+        by_cat.setdefault(c.get("category", "その他"), []).append((c, score))
+    return {cat: heapq.nlargest(per_category, items, key=lambda x: x[1]) for cat, items in by_cat.items()}
+
+
+def search_outfits(
+    candidates: List[Dict[str, Any]],
+    temp_c: float,
+    weather: str,
+    tpo: Optional[str] = None,
+    top_n: int = TOP_N,
+    per_category: int = PER_CATEGORY,
+    beam_width: int = BEAM_WIDTH,
+    max_ops: int = MAX_OPS,
+    time_budget_ms: float = TIME_BUDGET_MS,
+    seed: Optional[int] = None,
+) -> List[Outfit]:
+    """
+    Beam search over one item per category (tops x bottoms x outerwear x ...), scoring whole
+    outfits: per-item fit, pairwise colour/pattern compatibility and summed warmth against the
+    temperature. Once `max_ops` expansions or `time_budget_ms` are spent, the remaining slots are
+    filled greedily, so a result is always returned. Returns up to `top_n` outfits, best first.
+    """
+    pruned = prune_candidates(candidates, temp_c, weather, per_category, seed)
+    if not pruned:
+        return []
+    slots = _order_slots(list(pruned.keys()))
+    required = required_warmth(temp_c, slots)
+    target = target_warmth(temp_c)
+
+    # スロットごとの選択肢: (item, 単品スコア, 暖かさ)。省略可能スロットには None を加える。
+    # ただし候補が省略可能なカテゴリ (アウター) だけのときは、空のコーデにならないよう省略させない
+    can_omit = any(slot not in OPTIONAL_CATEGORIES for slot in slots)
+    options: List[List[Tuple[Optional[Dict[str, Any]], float, float]]] = []
+    for slot in slots:
+        opts = []
+        for item, score in pruned[slot]:
+            w = scoring._warmth(item.get("features") or {})
+            # 単品スコアは 0 を上限に正規化 (理想の暖かさ・雨対応で 0)
+            utility = (score - 10) + (1 - ITEM_WARMTH_WEIGHT) * abs(target - w)
+            opts.append((item, utility, w if slot in WARMTH_CATEGORIES else 0.0))
+        if can_omit and slot in OPTIONAL_CATEGORIES:
+            opts.append((None, 0.0, 0.0))
+        options.append(opts)
+
+    # 残りスロットで取り得る暖かさの範囲 (部分解の暖かさ減点の下界に使う)
+    rest_min = [0.0] * (len(slots) + 1)
+    rest_max = [0.0] * (len(slots) + 1)
+    for k in range(len(slots) - 1, -1, -1):
+        ws = [o[2] for o in options[k]]
+        rest_min[k] = rest_min[k + 1] + min(ws)
+        rest_max[k] = rest_max[k + 1] + max(ws)
+
+    def warmth_penalty(w: float, k: int) -> float:
+        lo, hi = w + rest_min[k], w + rest_max[k]
+        if required < lo:
+            return WARMTH_WEIGHT * (lo - required)
+        if required > hi:
+            return WARMTH_WEIGHT * (required - hi)
+        return 0.0
+
+    deadline = time.perf_counter() + time_budget_ms / 1000.0
+    ops = 0
+    exhausted = False
+    # beam の状態: (部分スコア, 選んだ item の tuple, 暖かさ合計)
+    beam: List[Tuple[float, Tuple[Optional[Dict[str, Any]], ...], float]] = [(0.0, (), 0.0)]
+    for k, opts in enumerate(options):
+        expanded = []
+        for base, chosen, warmth in beam:
+            # 予算切れ後は各状態を最良の選択肢 1 つだけで延長する
+            for item, utility, w in (opts[:1] if exhausted else opts):
+                score = base + utility
+                if item is not None:
+                    f = item.get("features") or {}
+                    for other in chosen:
+                        if other is not None:
+                            score += pair_score(f, other.get("features") or {})
+                ops += 1
+                expanded.append((score, chosen + (item,), warmth + w))
+            if not exhausted and (ops >= max_ops or time.perf_counter() >= deadline):
+                exhausted = True
+        width = top_n if k == len(options) - 1 else beam_width
+        beam = heapq.nlargest(width, expanded, key=lambda s: s[0] - warmth_penalty(s[2], k + 1))
+
+    outfits = [
+        Outfit(
+            items=tuple(i for i in chosen if i is not None),
+            score=score - warmth_penalty(warmth, len(slots)),
+            warmth=warmth,
+            required_warmth=required,
+        )
+        for score, chosen, warmth in beam
+    ]
+    outfits.sort(key=lambda o: o.score, reverse=True)
+    return outfits[:top_n]
+
+
+def describe_outfit(outfit: Outfit, slots_present: Sequence[str]) -> str:
+    """Japanese explanation in the same style as the per-category picker."""
+    reasons = []
+    for item in outfit.items:
+        f = item.get("features") or {}
+        reasons.append(f"{item.get('category', 'その他')}には{f.get('color')}の{f.get('pattern')}が合います。")
+    chosen = {i.get("category") for i in outfit.items}
+    for cat in slots_present:
+        if cat in OPTIONAL_CATEGORIES and cat not in chosen:
+            reasons.append(f"今日は{cat}なしで十分です。")
+    reasons.append(f"全体の暖かさ {outfit.warmth:.0f}（目安 {outfit.required_warmth:.0f}）、組み合わせスコア {outfit.score:.1f}")
+    return "\n".join(reasons)
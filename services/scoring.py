@@ -0,0 +1,123 @@
+from __future__ import annotations
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.lazy import optional_import
+
+# NumPy は任意依存。無い場合は ai_stylist の逐次版が使われる (初回使用時に読み込む)
+np = optional_import("numpy")
+
+DEFAULT_TOP_K = 1
+# これ以上の候補数では列指向スコアラーを使う (少数だと配列化のコストが上回る)
+VECTORIZE_MIN_CANDIDATES = int(os.environ.get("VECTORIZE_MIN_CANDIDATES", "256"))
+RAIN_PENALTY = 3.0
+TIE_BREAK_SCALE = 0.5
+
+
+def target_warmth(temp_c: float) -> int:
+    """Preferred warmth_level for a temperature: lower temp -> higher warmth_level."""
+    if temp_c <= 5:
+        return 5
+    elif temp_c <= 12:
+        return 4
+    elif temp_c <= 18:
+        return 3
+    elif temp_c <= 24:
+        return 2
+    return 1
+
+
+def weather_band(weather: str, temp_c: float) -> Tuple[bool, int]:
+    """The part of the weather the heuristic depends on: rain or not, and the target warmth."""
+    return weather.lower().startswith("rain"), target_warmth(temp_c)
+
+
+def _warmth(features: Dict[str, Any]) -> float:
+    wl = features.get("warmth_level") or 3
+    if type(wl) is int:
+        return wl
+    try:
+        return float(wl)
+    except (TypeError, ValueError):
+        return 3.0
+
+
+class CandidateMatrix:
+    """
+    Columnar view of candidate clothes: warmth, rain-ok and category codes as NumPy arrays.
+    Build it once per candidate set and score whole categories in a single pass.
+    """
+
+    def __init__(self, candidates: List[Dict[str, Any]]):
+        if np is None:
+            raise RuntimeError("numpy is not installed")
+        self.items = list(candidates)
+        self.categories: List[str] = []
+        codes: Dict[str, int] = {}
+        cat_codes: List[int] = []
+        warmth: List[float] = []
+        rain_ok: List[bool] = []
+        # 要素ごとの ndarray 代入は遅いので、一旦 list に集めてから配列化する
+        for c in self.items:
+            cat = c.get("category", "その他")
+            code = codes.get(cat)
+            if code is None:
+                code = codes[cat] = len(self.categories)
+                self.categories.append(cat)
+            features = c.get("features") or {}
+            cat_codes.append(code)
+            warmth.append(_warmth(features))
+            rain_ok.append(bool(features.get("is_rain_ok", False)))
+        self.cat_codes = np.array(cat_codes, dtype=np.int32)
+        self.warmth = np.array(warmth, dtype=np.float64)
+        self.rain_ok = np.array(rain_ok, dtype=bool)
+        # カテゴリごとの行番号 (出現順を保つ安定ソート)
+        order = np.argsort(self.cat_codes, kind="stable")
+        bounds = np.searchsorted(self.cat_codes[order], np.arange(len(self.categories) + 1))
+        self.groups = [order[bounds[k]:bounds[k + 1]] for k in range(len(self.categories))]
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def base_scores(self, temp_c: float, weather: str) -> "np.ndarray":
+        """Deterministic part of the heuristic score (no tie-breaker)."""
+        scores = 10.0 - np.abs(target_warmth(temp_c) - self.warmth)
+        if weather.lower().startswith("rain"):
+            scores -= RAIN_PENALTY * ~self.rain_ok
+        return scores
+
+    def scores(self, temp_c: float, weather: str, rng: Optional["np.random.Generator"] = None) -> "np.ndarray":
+        rng = rng if rng is not None else np.random.default_rng()
+        return self.base_scores(temp_c, weather) + rng.random(len(self.items)) * TIE_BREAK_SCALE
+
+    def top_k(self, scores: "np.ndarray", k: int = DEFAULT_TOP_K) -> List["np.ndarray"]:
+        """Row indices of the k best items per category, best first."""
+        out = []
+        for idx in self.groups:
+            s = scores[idx]
+            if len(idx) > k:
+                part = np.argpartition(-s, k - 1)[:k]
+            else:
+                part = np.arange(len(idx))
+            out.append(idx[part[np.argsort(-s[part], kind="stable")]])
+        return out
+
+
+def recommend_outfit_vectorized(
+    candidates: List[Dict[str, Any]],
+    temp_c: float,
+    weather: str,
+    tpo: Optional[str] = None,
+    seed: Optional[int] = None,
+) -> Dict[str, Any]:
+    """NumPy version of `recommend_outfit`: same {selected, reason} shape, best item per category."""
+    m = CandidateMatrix(candidates)
+    scores = m.scores(temp_c, weather, np.random.default_rng(seed))
+    selected = []
+    reasons = []
+    for cat, top in zip(m.categories, m.top_k(scores, 1)):
+        i = int(top[0])
+        best = m.items[i]
+        selected.append(best)
+        reasons.append(f"{cat}には{best['features'].get('color')}の{best['features'].get('pattern')}が合います。（候補スコア {scores[i]:.1f}）")
+    return {"selected": selected, "reason": "\n".join(reasons)}
@@ -0,0 +1,177 @@
+from __future__ import annotations
+import os
+from pathlib import Path
+from typing import Any, Iterable, List, NamedTuple, Optional
+from uuid import UUID
+
+from services.lazy import optional_import
+from services.thumbnails import run_in_worker
+from services.user_cache import UserCache
+
+# NumPy は任意依存。無い場合は同じ計算を 1 件ずつ行う (どちらも初回使用時に読み込む)
+np = optional_import("numpy")
+# Pillow が無い場合は署名を計算せず、近似重複の判定もしない
+Image = optional_import("PIL.Image")
+ImageOps = optional_import("PIL.ImageOps")
+
+# dHash: 9x8 に縮小したグレースケール画像で、横に隣り合う画素の大小を 64 ビットにする
+HASH_BITS = 64
+# 色ヒストグラム: RGB 各 4 段階 = 64 ビン。各ビンは画素の割合を 0..255 に量子化した 1 バイト
+HIST_LEVELS = 4
+HIST_BYTES = HIST_LEVELS ** 3
+HIST_SAMPLE_PX = 32
+
+# 近似重複とみなす上限 (ハッシュの異なるビット数と、色ヒストグラムの L1 距離 0..2)
+NEAR_DUP_ENABLED = os.environ.get("NEAR_DUP_ENABLED", "1").lower() not in ("0", "false", "no")
+NEAR_DUP_MAX_DISTANCE = int(os.environ.get("NEAR_DUP_MAX_DISTANCE", "6"))
+NEAR_DUP_MAX_COLOR_DISTANCE = float(os.environ.get("NEAR_DUP_MAX_COLOR_DISTANCE", "0.3"))
+# GET /clothes/{id}/similar の既定の距離上限
+SIMILAR_MAX_DISTANCE = int(os.environ.get("SIMILAR_MAX_DISTANCE", "20"))
+SIMILARITY_INDEX_USERS = int(os.environ.get("SIMILARITY_INDEX_USERS", "2000"))
+SIMILARITY_INDEX_TTL = float(os.environ.get("SIMILARITY_INDEX_TTL", "600"))
+
+_MASK64 = (1 << 64) - 1
+
+
+class Signature(NamedTuple):
+    # BIGINT に入れるため符号付き 64 ビットで持つ
+    phash: int
+    color_hist: bytes
+
+
+def to_signed64(value: int) -> int:
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def dhash(img) -> int:
+    gray = img.convert("L").resize((9, 8), Image.LANCZOS)
+    px = list(gray.getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (px[row * 9 + col] > px[row * 9 + col + 1])
+    return bits
+
+
+def color_histogram(img) -> bytes:
+    small = img.convert("RGB").resize((HIST_SAMPLE_PX, HIST_SAMPLE_PX), Image.BILINEAR)
+    counts = [0] * HIST_BYTES
+    shift = 8 - (HIST_LEVELS - 1).bit_length()
+    for r, g, b in small.getdata():
+        counts[((r >> shift) * HIST_LEVELS + (g >> shift)) * HIST_LEVELS + (b >> shift)] += 1
+    total = HIST_SAMPLE_PX * HIST_SAMPLE_PX
+    return bytes(round(c * 255 / total) for c in counts)
+
+
+def signature_of(path: str) -> Signature:
+    """Runs in the image worker pool: decode once (reduced for JPEG) and compute both parts."""
+    with Image.open(path) as img:
+        img.draft("RGB", (HIST_SAMPLE_PX * 4,) * 2)
+        img = ImageOps.exif_transpose(img)
+        return Signature(to_signed64(dhash(img)), color_histogram(img))
+
+
+async def compute_signature(path: Path) -> Optional[Signature]:
+    """Perceptual hash + colour histogram of an image file; None when it cannot be computed."""
+    if Image is None:
+        return None
+    try:
+        return await run_in_worker(signature_of, str(path))
+    except Exception as e:
+        print(f"image signature failed for {path}: {e}")
+        return None
+
+
+def hamming(a: int, b: int) -> int:
+    return ((a ^ b) & _MASK64).bit_count()
+
+
+def color_distance(a: bytes, b: bytes) -> float:
+    return sum(abs(x - y) for x, y in zip(a, b)) / 255
+
+
+_POPCOUNT8 = None
+
+
+def _popcount64(x):
+    global _POPCOUNT8
+    if hasattr(np, "bitwise_count"):  # NumPy 2.0+
+        return np.bitwise_count(x)
+    if _POPCOUNT8 is None:
+        _POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+    return _POPCOUNT8[x.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.uint8)
+
+
+class Match(NamedTuple):
+    row: Any
+    distance: int
+    color_distance: float
+
+
+class UserIndex:
+    """
+    One user's clothes with their image signatures as fixed-width arrays: a uint64 hash per
+    item and a (n, HIST_BYTES) histogram matrix. Rows need `cloth_id`, `features`, `phash`
+    and `color_hist`; they are returned as-is in matches.
+    """
+
+    def __init__(self, rows: Iterable[Any]):
+        self.rows = tuple(rows)
+        self._positions = {row.cloth_id: i for i, row in enumerate(self.rows)}
+        if np is not None:
+            n = len(self.rows)
+            self.hashes = np.fromiter((r.phash for r in self.rows), dtype=np.int64, count=n).view(np.uint64)
+            hists = np.frombuffer(b"".join(r.color_hist for r in self.rows), dtype=np.uint8)
+            # 差を取るので符号付きで持っておく
+            self.hists = hists.reshape(n, HIST_BYTES).astype(np.int16)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def get(self, cloth_id: UUID) -> Optional[Any]:
+        i = self._positions.get(cloth_id)
+        return None if i is None else self.rows[i]
+
+    def search(self, sig: Signature, k: int, max_distance: int, exclude: Optional[UUID] = None) -> List[Match]:
+        """Up to `k` items within `max_distance` hash bits, nearest first (ties by colour distance)."""
+        if not self.rows:
+            return []
+        if np is None:
+            return self._search_scalar(sig, k, max_distance, exclude)
+        q = np.array([sig.phash], dtype=np.int64).view(np.uint64)
+        dist = _popcount64(self.hashes ^ q)
+        # 色の距離はハッシュで絞った後の行だけ計算する
+        idx = np.flatnonzero(dist <= max_distance)
+        if exclude is not None and exclude in self._positions:
+            idx = idx[idx != self._positions[exclude]]
+        if not len(idx):
+            return []
+        qh = np.frombuffer(sig.color_hist, dtype=np.uint8).astype(np.int16)
+        color = np.abs(self.hists[idx] - qh).sum(axis=1) / 255
+        order = np.lexsort((color, dist[idx]))[:k]
+        return [Match(self.rows[idx[i]], int(dist[idx[i]]), float(color[i])) for i in order]
+
+    def _search_scalar(self, sig: Signature, k: int, max_distance: int, exclude: Optional[UUID]) -> List[Match]:
+        matches = []
+        for row in self.rows:
+            if row.cloth_id == exclude:
+                continue
+            d = hamming(row.phash, sig.phash)
+            if d <= max_distance:
+                matches.append(Match(row, d, color_distance(row.color_hist, sig.color_hist)))
+        matches.sort(key=lambda m: (m.distance, m.color_distance))
+        return matches[:k]
+
+    def near_duplicate(self, sig: Signature) -> Optional[Any]:
+        """The closest analysed item that looks like the same photo subject, if any."""
+        if not NEAR_DUP_ENABLED:
+            return None
+        for m in self.search(sig, k=8, max_distance=NEAR_DUP_MAX_DISTANCE):
+            # 解析待ち (features が空) の服からは流用できない
+            if m.color_distance <= NEAR_DUP_MAX_COLOR_DISTANCE and m.row.features:
+                return m.row
+        return None
+
+
+# 書き込み側は commit 後に similarity_cache.invalidate(user_id) を呼ぶ (candidate_cache と同じ)
+similarity_cache: UserCache[UserIndex] = UserCache(SIMILARITY_INDEX_USERS, SIMILARITY_INDEX_TTL)
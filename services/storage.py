@@ -0,0 +1,124 @@
+from __future__ import annotations
+import os
+import asyncio
+import hashlib
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+# 1 チャンクあたりの読み込みサイズ。スマホ写真 (数MB) でも数回の往復で済む大きさ
+CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", str(15 * 1024 * 1024)))
+
+_ALLOWED_EXTS = {".jpg", ".jpeg", ".png", ".heic", ".webp"}
+# 書き込み途中のファイルの置き場所。os.replace が原子的になるよう upload_dir と同じファイルシステム上に置き、
+# "." で始まる名前なので /uploads からは配信されない (ImmutableStaticFiles を参照)
+PARTIAL_SUBDIR = ".partial"
+
+
+class UploadTooLarge(ValueError):
+    """Raised when an upload exceeds the configured size limit."""
+
+    def __init__(self, limit: int):
+        super().__init__(f"upload exceeds {limit} bytes")
+        self.limit = limit
+
+
+@dataclass
+class StoredImage:
+    filename: str
+    sha256: str
+    size: int
+    # False when an identical blob was already stored (duplicate upload)
+    created: bool
+
+
+def _normalize_ext(filename: Optional[str]) -> str:
+    ext = Path(filename or "").suffix.lower()
+    if ext == ".jpeg":
+        return ".jpg"
+    return ext if ext in _ALLOWED_EXTS else ".jpg"
+
+
+def _partial_file(upload_dir: Path):
+    partial_dir = upload_dir / PARTIAL_SUBDIR
+    partial_dir.mkdir(exist_ok=True)
+    return tempfile.mkstemp(dir=partial_dir, suffix=".part")
+
+
+def _finalize(tmp_path: str, dest: Path) -> bool:
+    """Move the temp file to its content-addressed name. Returns False if the blob already existed."""
+    if dest.exists():
+        os.unlink(tmp_path)
+        return False
+    # os.replace is atomic on the same filesystem, so concurrent identical uploads are safe
+    os.replace(tmp_path, dest)
+    return True
+
+
+async def ingest_upload(file, upload_dir: Path, max_bytes: int = MAX_UPLOAD_BYTES) -> StoredImage:
+    """
+    Store an UploadFile as `<sha256><ext>`. Starlette has already spooled the part (the request
+    body is capped as it arrives, see main.UploadSizeLimit), so the file is hashed first and only
+    written when the blob is new: a duplicate upload costs no disk writes.
+    File I/O runs in a worker thread so large uploads never block the event loop.
+    """
+    # starlette が Content-Length からサイズを把握している場合は読む前に弾く
+    size_hint = getattr(file, "size", None)
+    if size_hint is not None and size_hint > max_bytes:
+        raise UploadTooLarge(max_bytes)
+
+    upload_dir = Path(upload_dir)
+    h = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = await file.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadTooLarge(max_bytes)
+        h.update(chunk)
+
+    digest = h.hexdigest()
+    filename = f"{digest}{_normalize_ext(file.filename)}"
+    dest = upload_dir / filename
+    if await asyncio.to_thread(dest.exists):
+        return StoredImage(filename=filename, sha256=digest, size=size, created=False)
+
+    # 新しい内容のときだけ書き出す (.partial に書いてから置き換える)
+    await file.seek(0)
+    fd, tmp_path = await asyncio.to_thread(_partial_file, upload_dir)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                await asyncio.to_thread(out.write, chunk)
+    except BaseException:
+        await asyncio.to_thread(_unlink_quietly, tmp_path)
+        raise
+
+    created = await asyncio.to_thread(_finalize, tmp_path, dest)
+    return StoredImage(filename=filename, sha256=digest, size=size, created=created)
+
+
+def _unlink_quietly(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+_SHA256_HEX_LEN = 64
+
+
+def content_hash_from_url(url: str) -> Optional[str]:
+    """Recover the SHA-256 from a content-addressed upload URL (`.../<sha256>[_suffix].ext`)."""
+    stem = Path(url.split("?", 1)[0]).name.split(".", 1)[0]
+    digest = stem[:_SHA256_HEX_LEN]
+    if len(digest) == _SHA256_HEX_LEN and all(c in "0123456789abcdef" for c in digest):
+        return digest
+    return None
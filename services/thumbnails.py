@@ -0,0 +1,125 @@
+from __future__ import annotations
+import os
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Callable, Dict, Optional, TypeVar
+
+from starlette.staticfiles import StaticFiles
+
+from services.lazy import optional_import
+
+# Pillow は任意依存。無い場合は派生画像を作らず原寸画像だけを使う (初回使用時に読み込む)
+Image = optional_import("PIL.Image")
+ImageOps = optional_import("PIL.ImageOps")
+
+# 名前 -> 長辺のピクセル数。sm は一覧のグリッド、md は詳細表示と Vision API (detail=low は 512px) 用
+THUMBNAIL_SIZES: Dict[str, int] = {"sm": 256, "md": 512}
+THUMBNAIL_FORMAT = os.environ.get("THUMBNAIL_FORMAT", "webp").lower()
+THUMBNAIL_QUALITY = int(os.environ.get("THUMBNAIL_QUALITY", "80"))
+THUMBNAIL_WORKERS = int(os.environ.get("THUMBNAIL_WORKERS", str(min(4, os.cpu_count() or 1))))
+THUMBNAIL_SUBDIR = "thumbs"
+# ファイル名は内容ハッシュなので、同じ URL の中身が変わることはない
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_PIL_FORMATS = {"webp": "WEBP", "jpg": "JPEG"}
+
+T = TypeVar("T")
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """
+    StaticFiles for content-addressed files: long-lived, immutable cache headers.
+    Paths with a component starting with "." (files still being written) are not served.
+    """
+
+    def lookup_path(self, path: str):
+        if any(part.startswith(".") for part in Path(path).parts):
+            return "", None
+        return super().lookup_path(path)
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        if response.status_code == 200:
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+
+def derivative_name(sha256: str, size: str, fmt: str = THUMBNAIL_FORMAT) -> str:
+    # `<sha256>_<size>.<ext>`: content_hash_from_url で元画像のハッシュに戻せる形
+    return f"{sha256}_{size}.{fmt}"
+
+
+def _render(src: str, out_dir: str, sha256: str, sizes: Dict[str, int], fmt: str, quality: int) -> Dict[str, str]:
+    """Runs in a worker process: decode once, write each missing derivative atomically."""
+    out = Path(out_dir)
+    names = {name: derivative_name(sha256, name, fmt) for name in sizes}
+    todo = {name: px for name, px in sizes.items() if not (out / names[name]).exists()}
+    if not todo:
+        return names
+    with Image.open(src) as img:
+        # JPEG は縮小デコードできるので、最大サイズ分だけ読む
+        img.draft("RGB", (max(todo.values()),) * 2)
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        # 大きい順に縮小して、次のサイズは前の結果から作る
+        for name, px in sorted(todo.items(), key=lambda kv: -kv[1]):
+            img.thumbnail((px, px), Image.LANCZOS)
+            tmp = out / f".{names[name]}.{os.getpid()}.part"
+            img.save(tmp, _PIL_FORMATS[fmt], quality=quality)
+            os.replace(tmp, out / names[name])
+    return names
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn: イベントループやスレッドを抱えたプロセスを fork しない
+        _executor = ProcessPoolExecutor(THUMBNAIL_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def run_in_worker(fn: Callable[..., T], *args) -> T:
+    """Run a picklable top-level `fn(*args)` in the image worker pool (decoding is CPU-bound)."""
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(_get_executor(), fn, *args)
+    except BrokenProcessPool:
+        # ワーカーが落ちたプールは使い物にならないので、次回作り直す
+        shutdown()
+        raise
+
+
+async def make_thumbnails(src: Path, sha256: str, upload_dir: Path) -> Dict[str, str]:
+    """
+    Create the fixed-size derivatives of an uploaded image in the process pool.
+    Returns {size name: path relative to upload_dir}; empty when Pillow is missing or the image
+    cannot be decoded (callers fall back to the original).
+    """
+    if Image is None or THUMBNAIL_FORMAT not in _PIL_FORMATS:
+        return {}
+    out_dir = Path(upload_dir) / THUMBNAIL_SUBDIR
+    out_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        names = await run_in_worker(
+            _render, str(src), str(out_dir), sha256, THUMBNAIL_SIZES, THUMBNAIL_FORMAT, THUMBNAIL_QUALITY,
+        )
+    except BrokenProcessPool as e:
+        print(f"thumbnail worker pool broken: {e}")
+        return {}
+    except Exception as e:
+        print(f"thumbnail generation failed for {sha256}: {e}")
+        return {}
+    return {name: f"{THUMBNAIL_SUBDIR}/{filename}" for name, filename in names.items()}
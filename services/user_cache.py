@@ -0,0 +1,83 @@
+from __future__ import annotations
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Generic, NamedTuple, Optional, TypeVar
+from uuid import UUID
+
+V = TypeVar("V")
+
+
+class _Entry(NamedTuple):
+    expires_at: float
+    value: Any
+
+
+class UserCache(Generic[V]):
+    """
+    Per-user LRU with a TTL, for values loaded from the database in this worker process.
+    Writers call `invalidate(user_id)` after committing; a reader takes `generation(user_id)`
+    before loading and `put` drops the result if the user was invalidated in between.
+    Subclasses can reject stale values in `_fresh`.
+    """
+
+    def __init__(self, max_users: int, ttl_seconds: float):
+        self.max_users = max_users
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[UUID, _Entry]" = OrderedDict()
+        # 無効化ごとに進む時刻と、直近 max_users 件の無効化の時刻。
+        # 記録から落ちた無効化は _floor にまとめ、それより前に読み始めた put を保存しない
+        # (ユーザー数によらずメモリが一定になり、取りこぼしても余分なミスになるだけ)
+        self._clock = 0
+        self._floor = 0
+        self._invalidated: "OrderedDict[UUID, int]" = OrderedDict()
+        self.counters = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.counters, "size": len(self._entries)}
+
+    def generation(self, user_id: UUID) -> int:
+        return self._clock
+
+    def _invalidated_since(self, user_id: UUID, generation: int) -> bool:
+        return self._invalidated.get(user_id, self._floor) > generation
+
+    def _fresh(self, value: V) -> bool:
+        return True
+
+    def get(self, user_id: UUID) -> Optional[V]:
+        entry = self._entries.get(user_id)
+        if entry is None or entry.expires_at <= time.monotonic() or not self._fresh(entry.value):
+            if entry is not None:
+                del self._entries[user_id]
+            self.counters["misses"] += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.counters["hits"] += 1
+        return entry.value
+
+    def put(self, user_id: UUID, value: V, generation: int) -> None:
+        # 読み込み中に invalidate された場合は保存しない
+        if self._invalidated_since(user_id, generation):
+            return
+        self._entries[user_id] = _Entry(time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_users:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Invalidate every user (e.g. when invalidations from other processes may have been missed)."""
+        self._clock += 1
+        self._floor = self._clock
+        self._invalidated.clear()
+        self._entries.clear()
+        self.counters["invalidations"] += 1
+
+    def invalidate(self, user_id: UUID) -> None:
+        self._clock += 1
+        self._invalidated[user_id] = self._clock
+        self._invalidated.move_to_end(user_id)
+        while len(self._invalidated) > self.max_users:
+            _, at = self._invalidated.popitem(last=False)
+            self._floor = max(self._floor, at)
+        self._entries.pop(user_id, None)
+        self.counters["invalidations"] += 1
@@ -0,0 +1,92 @@
+"""
+Cross-process invalidation of the per-user caches (candidate_cache, similarity_cache).
+
+The caches live in each worker process, so a change committed by one worker (or by the analysis
+workers, the daily batch, a COPY import) must reach the others. A trigger on `clothes`
+(init_db.sql, migrations/009) sends the row's user_id on the `wardrobe_changed` channel; every
+process LISTENs on a dedicated connection and drops that user's entries. Notifications are
+delivered only after commit, and duplicates within a transaction are merged by Postgres.
+Notifications sent while the listener is disconnected are lost, so the caches are cleared on
+every (re)connect.
+"""
+from __future__ import annotations
+import os
+import asyncio
+from typing import Callable, Optional
+from uuid import UUID
+
+import asyncpg
+from sqlalchemy.engine import make_url
+
+WARDROBE_CHANNEL = "wardrobe_changed"
+WARDROBE_EVENTS_ENABLED = os.environ.get("WARDROBE_EVENTS_ENABLED", "1").lower() not in ("0", "false", "no")
+# 切断を検出するための死活確認の間隔と、再接続までの待ち時間
+WARDROBE_EVENTS_PING_SECONDS = float(os.environ.get("WARDROBE_EVENTS_PING_SECONDS", "30"))
+WARDROBE_EVENTS_RETRY_SECONDS = float(os.environ.get("WARDROBE_EVENTS_RETRY_SECONDS", "5"))
+
+
+def asyncpg_dsn(database_url: str) -> str:
+    """`postgresql+asyncpg://...` (SQLAlchemy URL) as a DSN asyncpg.connect accepts."""
+    return make_url(database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+class WardrobeListener:
+    """LISTEN on WARDROBE_CHANNEL and call `on_change(user_id)`; `on_reset()` after each (re)connect."""
+
+    def __init__(
+        self,
+        database_url: str,
+        on_change: Callable[[UUID], None],
+        on_reset: Callable[[], None],
+        ping_seconds: float = WARDROBE_EVENTS_PING_SECONDS,
+        retry_seconds: float = WARDROBE_EVENTS_RETRY_SECONDS,
+    ):
+        self._dsn = asyncpg_dsn(database_url)
+        self._on_change = on_change
+        self._on_reset = on_reset
+        self._ping_seconds = ping_seconds
+        self._retry_seconds = retry_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if WARDROBE_EVENTS_ENABLED and self._task is None:
+            self._task = asyncio.create_task(self._run(), name="wardrobe-listener")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def _notified(self, conn, pid, channel, payload) -> None:
+        try:
+            user_id = UUID(payload)
+        except ValueError:
+            return
+        self._on_change(user_id)
+
+    async def _run(self) -> None:
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(self._dsn)
+                closed = asyncio.Event()
+                conn.add_termination_listener(lambda _conn: closed.set())
+                await conn.add_listener(WARDROBE_CHANNEL, self._notified)
+                # 接続していなかった間の通知は届かないので、ここで全ユーザー分を捨てる
+                self._on_reset()
+                while not closed.is_set():
+                    try:
+                        await asyncio.wait_for(closed.wait(), timeout=self._ping_seconds)
+                    except asyncio.TimeoutError:
+                        # ソケットが閉じられずに通信が途絶えた場合は、ここで例外になる
+                        await asyncio.wait_for(conn.execute("SELECT 1"), timeout=self._ping_seconds)
+                print("wardrobe listener: connection closed")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"wardrobe listener error: {e}")
+            finally:
+                if conn is not None:
+                    conn.terminate()
+            await asyncio.sleep(self._retry_seconds)
@@ -0,0 +1,192 @@
+from __future__ import annotations
+import os
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+
+WEATHER_PROVIDER = os.environ.get("WEATHER_PROVIDER", "stub")
+# geohash 5 桁 ≒ 4.9km 四方。天気の粒度としては十分
+WEATHER_GEOHASH_PRECISION = int(os.environ.get("WEATHER_GEOHASH_PRECISION", "5"))
+WEATHER_TTL = float(os.environ.get("WEATHER_TTL", "600"))
+# TTL 切れ後もこの秒数までは古い値を返しつつ裏で更新する (stale-while-revalidate)
+WEATHER_STALE_TTL = float(os.environ.get("WEATHER_STALE_TTL", "3600"))
+WEATHER_TIMEOUT = float(os.environ.get("WEATHER_TIMEOUT", "3.0"))
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash_encode(lat: float, lon: float, precision: int = WEATHER_GEOHASH_PRECISION) -> str:
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    out = []
+    bits = 0
+    ch = 0
+    even = True
+    while len(out) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                ch = (ch << 1) | 1
+                lon_lo = mid
+            else:
+                ch <<= 1
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                ch = (ch << 1) | 1
+                lat_lo = mid
+            else:
+                ch <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            out.append(_BASE32[ch])
+            bits = 0
+            ch = 0
+    return "".join(out)
+
+
+def geohash_center(gh: str) -> Tuple[float, float]:
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    even = True
+    for c in gh:
+        v = _BASE32.index(c)
+        for shift in range(4, -1, -1):
+            bit = (v >> shift) & 1
+            if even:
+                mid = (lon_lo + lon_hi) / 2
+                if bit:
+                    lon_lo = mid
+                else:
+                    lon_hi = mid
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                if bit:
+                    lat_lo = mid
+                else:
+                    lat_hi = mid
+            even = not even
+    return (lat_lo + lat_hi) / 2, (lon_lo + lon_hi) / 2
+
+
+class WeatherProvider(ABC):
+    """Upstream weather source. Returns {"weather": str, "temp_c": float}."""
+
+    @abstractmethod
+    async def fetch(self, lat: float, lon: float) -> Dict[str, object]:
+        ...
+
+
+class StubWeatherProvider(WeatherProvider):
+    """Local deterministic stand-in until a real provider is wired up."""
+
+    async def fetch(self, lat: float, lon: float) -> Dict[str, object]:
+        # Very simple mock: return weather string and temp_c
+        # For deterministic results, use lat/lon to vary temperature
+        temp_c = 15 + (int(abs(lat * 100)) % 15) - (int(abs(lon * 100)) % 7)
+        weather = "clear" if (int(lat * 100) % 3) != 0 else "rain"
+        return {"weather": weather, "temp_c": float(temp_c)}
+
+
+_PROVIDERS = {
+    "stub": StubWeatherProvider,
+}
+
+
+def get_weather_provider(name: str = WEATHER_PROVIDER) -> WeatherProvider:
+    try:
+        return _PROVIDERS[name]()
+    except KeyError:
+        raise ValueError(f"unknown weather provider: {name}")
+
+
+class _Entry(NamedTuple):
+    value: Dict[str, object]
+    fresh_until: float
+    stale_until: float
+
+
+class WeatherCache:
+    """
+    Geohash-bucketed TTL cache in front of a WeatherProvider.
+    Concurrent misses for the same bucket share one upstream call (single-flight), and
+    expired-but-not-too-old entries are served immediately while a refresh runs in the background.
+    """
+
+    def __init__(
+        self,
+        provider: WeatherProvider,
+        ttl: float = WEATHER_TTL,
+        stale_ttl: float = WEATHER_STALE_TTL,
+        precision: int = WEATHER_GEOHASH_PRECISION,
+        timeout: float = WEATHER_TIMEOUT,
+        max_entries: int = 10000,
+    ):
+        self.provider = provider
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.precision = precision
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.counters = {"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0, "upstream_calls": 0, "upstream_errors": 0}
+
+    def bucket(self, lat: float, lon: float) -> str:
+        return geohash_encode(lat, lon, self.precision)
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.counters, "size": len(self._entries), "inflight": len(self._inflight)}
+
+    async def get(self, lat: float, lon: float) -> Dict[str, object]:
+        key = self.bucket(lat, lon)
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if now < entry.fresh_until:
+                self._entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return entry.value
+            if now < entry.stale_until:
+                self.counters["stale_hits"] += 1
+                self._load(key)  # revalidate in the background
+                return entry.value
+
+        self.counters["misses"] += 1
+        return await asyncio.shield(self._load(key))
+
+    def _load(self, key: str) -> asyncio.Future:
+        fut = self._inflight.get(key)
+        if fut is not None:
+            self.counters["coalesced"] += 1
+            return fut
+        fut = asyncio.ensure_future(self._fetch(key))
+        self._inflight[key] = fut
+        fut.add_done_callback(lambda f: self._settle(key, f))
+        return fut
+
+    async def _fetch(self, key: str) -> Dict[str, object]:
+        lat, lon = geohash_center(key)
+        self.counters["upstream_calls"] += 1
+        try:
+            value = await asyncio.wait_for(self.provider.fetch(lat, lon), timeout=self.timeout)
+        except Exception:
+            self.counters["upstream_errors"] += 1
+            raise
+        now = time.monotonic()
+        self._entries[key] = _Entry(value, now + self.ttl, now + self.ttl + self.stale_ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return value
+
+    def _settle(self, key: str, fut: asyncio.Future) -> None:
+        self._inflight.pop(key, None)
+        # バックグラウンド更新の失敗は誰も await しないので、ここで例外を回収しておく
+        if not fut.cancelled():
+            fut.exception()